@@ -0,0 +1,254 @@
+"""
+Offline benchmarks of the per-command code in KRMath and KRInfo.
+
+    python -m benchmarks.bench_commands --save baseline.json
+    python -m benchmarks.bench_commands --compare baseline.json --threshold 0.2
+    python -m benchmarks.bench_commands --goblin krinfo/Mask-of-Goblin --only krinfo
+
+KRInfo is measured on a synthetic Mask-of-Goblin checkout unless --goblin
+points at a real one. --sandbox also times %calc through the worker
+processes, including expressions that run out of time. Comparing against a
+baseline exits with 1 when any case got slower than the threshold allows.
+"""
+import argparse
+import asyncio
+from collections import OrderedDict
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+import numpy as np
+
+from krinfo.krinfo import KRInfo
+from krmath.krmath import KRMath
+from krmath.sandbox import Expressions, Sandbox, normalize
+
+from .goblin import write_dataset
+
+TYPICAL = (
+    "1+1",
+    "1.2*1500+50",
+    "(2450*1.35+120)*(1+0.45)*0.8",
+    "floor(1500*500/1000)+750",
+    "sqrt(2)^10/3",
+    "max(3200*1.3, 4100)-min(250, 300)",
+)
+ADVERSARIAL = (
+    "+".join(["1"] * 500),
+    "(" * 200 + "1" + ")" * 200,
+    "2^1000^2",
+    "99999^9999",
+    " ".join("( {} * {} )".format(i, i + 1) for i in range(100)).replace(") (", ")+("),
+)
+RUNAWAY = ("9^(9^9)", "2^(2^40)")
+SOFTCAP_VALUES = (-300, 0, 250, 900, 1500, 2600, 25000)
+
+
+def measure(func, repeat=7, budget=0.2):
+    """
+    Seconds per call of `func`, as timeit would, over `repeat` rounds.
+    """
+    number = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= budget / repeat or number >= 1 << 20:
+            break
+        number *= 2
+    samples = [elapsed / number]
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) / number)
+    samples.sort()
+    return {"median": statistics.median(samples), "best": samples[0], "worst": samples[-1],
+            "calls": number * repeat}
+
+
+def krmath_cases():
+    math = KRMath.__new__(KRMath)
+    stats = list(KRMath.softcaps)
+    raw = np.arange(-5000, 20001)
+
+    def actual_stat():
+        for stat in stats:
+            for value in SOFTCAP_VALUES:
+                math.actualStat(stat, value)
+
+    yield "krmath.actualStat.scalar", actual_stat
+    yield "krmath.actualStat.array", lambda: [math.actualStat(stat, raw) for stat in stats]
+    yield "krmath.sc_table", lambda: math.sc_table(1234)
+    yield "krmath.needstat", lambda: [math.engine.required(stat, 45.5) for stat in stats]
+
+    for label, expressions in (("typical", TYPICAL), ("adversarial", ADVERSARIAL)):
+        parsed = Expressions()
+
+        def cold(expressions=expressions, parsed=parsed):
+            for expr in expressions:
+                parsed.parser.parse(normalize(expr)).evaluate({})
+
+        def warm(expressions=expressions, parsed=parsed):
+            for expr in expressions:
+                parsed.evaluate(expr)
+
+        yield "krmath.parse.{}.cold".format(label), cold
+        yield "krmath.parse.{}.cached".format(label), warm
+
+    sweep = Expressions()
+    values = list(range(1000, 3001, 50))
+    yield "krmath.parse.sweep", lambda: sweep.evaluate("1.2*x+50", "x", values)
+
+
+def sandbox_cases():
+    loop = asyncio.new_event_loop()
+    sandbox = Sandbox()
+    loop.run_until_complete(sandbox.evaluate("0"))
+
+    def calc(expressions):
+        async def run():
+            for expr in expressions:
+                try:
+                    await sandbox.evaluate(expr)
+                except asyncio.TimeoutError:
+                    pass
+        return lambda: loop.run_until_complete(run())
+
+    yield "krmath.sandbox.typical", calc(TYPICAL)
+    yield "krmath.sandbox.runaway", calc(RUNAWAY)
+    sandbox.close()
+    loop.close()
+
+
+def krinfo_cases(folder, scratch):
+    info = KRInfo.__new__(KRInfo)
+    info.pack = None
+    info.templates = {}
+    info.embeds = OrderedDict()
+    info.aliases = None
+    info.locales = OrderedDict()
+    info.load_files(folder, scratch)
+    text = info.default
+    heroes = list(text.hero_names)
+    artifacts = list(text.artifact_names)
+    # what people actually type: lower case, missing letters, extra letters
+    queries = []
+    for name in heroes[::max(1, len(heroes) // 40)]:
+        queries += [name.lower(), name[:-1], name + "a", name[1:]]
+
+    # resolve skips the query cache, fuzzysearch goes through it
+    yield "krinfo.fuzzysearch.hero", lambda: [text.index("hero").resolve(query) for query in queries]
+    yield "krinfo.fuzzysearch.artifact", lambda: [text.index("artifact").resolve(query) for query in queries]
+    yield "krinfo.fuzzysearch.cached", lambda: [info.fuzzysearch(query, text.index("hero")) for query in queries]
+
+    def names_build():
+        text.set_aliases({})
+        text.index("hero")
+        text.index("artifact")
+
+    yield "krinfo.names.build", names_build
+
+    templates = []
+    for name in heroes:
+        templates += [(skill.description, skill.values) for skill in info.get_hero(name).skills]
+    yield "krinfo.parse_vars", lambda: [info.parse_vars(string_, vars_) for string_, vars_ in templates]
+
+    for builder in ("get_skill", "get_books", "get_perks", "get_story"):
+        func = getattr(info, builder)
+        yield "krinfo." + builder, lambda func=func: [func(name) for name in heroes]
+    for builder in ("get_uw", "get_ut"):
+        func = getattr(info, builder)
+        yield "krinfo." + builder, lambda func=func: [func(name, stars) for name in heroes
+                                                     for stars in range(6)]
+    yield "krinfo.get_artifact", lambda: [info.get_artifact(name, stars) for name in artifacts
+                                          for stars in range(6)]
+    yield "krinfo.cached_embed", lambda: [info.cached_embed(text, text.hero_names[name], info.get_skill, name)
+                                          for name in heroes[:info.EMBED_CACHE_SIZE]]
+    def build():
+        for pack in [info.pack] + [text.pack for text in info.locales.values()]:
+            pack.discard()
+        info.load_files(folder, scratch)
+
+    # loading swaps out the packs the cog reads from, so these go last
+    yield "krinfo.load_files", lambda: info.load_files(folder, scratch)
+    yield "krinfo.load_files.build", build
+
+
+def run(cases, repeat, budget):
+    results = {}
+    for name, func in cases:
+        results[name] = measure(func, repeat, budget)
+        print("{:<36}{:>12.1f} us".format(name, results[name]["median"] * 1e6))
+        sys.stdout.flush()
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Prints every case against the baseline, returns the ones that regressed.
+    """
+    regressed = []
+    print("\n{:<36}{:>12}{:>12}{:>9}".format("case", "baseline us", "now us", "change"))
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            print("{:<36}{:>12}{:>12.1f}{:>9}".format(name, "-", now["median"] * 1e6, "new"))
+            continue
+        change = now["median"] / before["median"] - 1
+        flag = ""
+        if change > threshold:
+            flag = "  REGRESSION"
+            regressed.append(name)
+        elif change < -threshold:
+            flag = "  faster"
+        print("{:<36}{:>12.1f}{:>12.1f}{:>+8.0%}{}".format(
+            name, before["median"] * 1e6, now["median"] * 1e6, change, flag))
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--goblin", help="Mask-of-Goblin checkout, synthetic data by default")
+    parser.add_argument("--heroes", type=int, default=120, help="heroes in the synthetic data")
+    parser.add_argument("--only", choices=("krmath", "krinfo"))
+    parser.add_argument("--sandbox", action="store_true", help="also time %%calc worker round trips")
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget", type=float, default=0.2, help="seconds to spend on each case")
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="baseline file to compare the results with")
+    parser.add_argument("--threshold", type=float, default=0.2,
+                        help="slowdown that counts as a regression, 0.2 is 20%%")
+    args = parser.parse_args()
+    # beautifultable warns about its old API on every call
+    warnings.simplefilter("ignore", FutureWarning)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as scratch:
+        if args.only != "krinfo":
+            results.update(run(krmath_cases(), args.repeat, args.budget))
+            if args.sandbox:
+                results.update(run(sandbox_cases(), 3, 0))
+        if args.only != "krmath":
+            folder = args.goblin or write_dataset(os.path.join(scratch, "goblin"), args.heroes)
+            results.update(run(krinfo_cases(folder, scratch), args.repeat, args.budget))
+
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"python": platform.python_version(), "machine": platform.machine(),
+                       "results": results}, f, indent=2, sort_keys=True)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+        if compare(results, baseline, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
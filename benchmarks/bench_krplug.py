@@ -0,0 +1,144 @@
+"""
+Offline benchmark of the KRPlug pipeline, fetch -> parse -> diff -> embed.
+
+    python -m benchmarks.bench_krplug --sizes 20 100 500 --iterations 50
+    python -m benchmarks.bench_krplug --pages saved_pages/ --parser html.parser
+
+Pages are served by a local stand-in server, so it needs the bot's
+requirements installed but no network access or Discord login.
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+
+import krplug.krplug
+from krplug.krplug import KRPlug
+from krplug.metrics import Metrics
+
+from .fixtures import load_pages, synthetic_pages
+from .server import BoardServer
+
+STAGES = ("fetch", "parse", "diff", "embed", "total")
+
+
+def make_plug():
+    # __init__ needs a running bot and Red's config, the pipeline methods only
+    # need the state set here
+    plug = KRPlug.__new__(KRPlug)
+    plug.validators = {}
+    plug.urls = {}
+    plug.metrics = Metrics()
+    return plug
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+async def bench_page(plug, session, url, iterations, conditional):
+    timings = {stage: [] for stage in STAGES}
+    posts = {}
+    errors = 0
+    board = None
+    for _ in range(iterations):
+        if not conditional:
+            plug.validators.clear()
+        start = time.perf_counter()
+        try:
+            page = await plug.fetch(session, url)
+        except Exception:
+            errors += 1
+            continue
+        fetched = time.perf_counter()
+        timings["fetch"].append(fetched - start)
+        if page is None:
+            timings["total"].append(fetched - start)
+            continue
+        ids, posts = plug.process_pages({url: page})
+        parsed = time.perf_counter()
+        if board is None:
+            # pretend the older half of the page has been announced already
+            newest_first = sorted(ids[url], reverse=True)
+            half = newest_first[len(newest_first) // 2:] or [0]
+            board = {"high": half[0], "recent": half[:KRPlug.SEEN_WINDOW]}
+        plug.unseen_ids(board, ids[url])
+        diffed = time.perf_counter()
+        for post in posts.values():
+            plug.get_embed(post)
+        done = time.perf_counter()
+        timings["parse"].append(parsed - fetched)
+        timings["diff"].append(diffed - parsed)
+        timings["embed"].append(done - diffed)
+        timings["total"].append(done - start)
+    return timings, len(posts), errors
+
+
+async def run(pages, iterations, latency, status, error_rate, conditional):
+    server = BoardServer(pages, latency, status, error_rate)
+    await server.start()
+    plug = make_plug()
+    results = {}
+    try:
+        connector = aiohttp.TCPConnector(limit_per_host=4, keepalive_timeout=90)
+        async with aiohttp.ClientSession(connector=connector) as session:
+            for name, page in pages.items():
+                url = server.board_url(name)
+                timings, count, errors = await bench_page(plug, session, url, iterations, conditional)
+                results[name] = (len(page.encode("utf-8")), count, errors, timings)
+    finally:
+        await server.stop()
+    return results
+
+
+def report(results):
+    print("{:<24}{:>8}{:>7}{:>7}  {:<6}{:>10}{:>10}{:>10}".format(
+        "page", "KiB", "posts", "errors", "stage", "p50 ms", "p95 ms", "p99 ms"))
+    for name, (size, count, errors, timings) in results.items():
+        first = True
+        for stage in STAGES:
+            samples = timings[stage]
+            if not samples:
+                continue
+            print("{:<24}{:>8}{:>7}{:>7}  {:<6}{:>10.3f}{:>10.3f}{:>10.3f}".format(
+                name if first else "", "{:.1f}".format(size / 1024) if first else "",
+                count if first else "", errors if first else "", stage,
+                percentile(samples, 50) * 1000, percentile(samples, 95) * 1000,
+                percentile(samples, 99) * 1000))
+            first = False
+        total = timings["total"]
+        if total:
+            print("{:<24}throughput {:.1f} pages/s, {:.0f} posts/s".format(
+                "", len(total) / sum(total), len(total) * count / sum(total)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", help="folder of saved board pages")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[20, 100, 500],
+                        help="posts per synthetic page")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--parser", default=krplug.krplug.PARSER,
+                        help="BeautifulSoup backend, html.parser or lxml")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--status", type=int, default=200, help="status of failing responses")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--conditional", action="store_true",
+                        help="keep ETags between iterations, so repeats are 304s")
+    args = parser.parse_args()
+
+    krplug.krplug.PARSER = args.parser
+    pages = synthetic_pages(args.sizes)
+    if args.pages:
+        pages.update(load_pages(args.pages))
+    loop = asyncio.get_event_loop()
+    results = loop.run_until_complete(run(pages, args.iterations, args.latency, args.status,
+                                          args.error_rate, args.conditional))
+    print("parser: {}".format(args.parser))
+    report(results)
+
+
+if __name__ == "__main__":
+    main()
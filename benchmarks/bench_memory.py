@@ -0,0 +1,89 @@
+"""
+Memory KRInfo holds for every hero and artifact of one locale.
+
+    python -m benchmarks.bench_memory
+    python -m benchmarks.bench_memory --goblin krinfo/Mask-of-Goblin
+
+Compares the dicts and lists straight from json.load, the way the files were
+read before records, with the records the cog builds from its data packs.
+"""
+import argparse
+import gc
+import json
+import os
+import tempfile
+import tracemalloc
+
+from krinfo.datapack import I18N, DataPack
+from krinfo.texts import LocaleText
+
+from .goblin import write_dataset
+
+LOCALE = "English"
+
+
+def held(func):
+    """
+    What `func` returns, and the bytes still allocated for it once it has.
+    """
+    gc.collect()
+    tracemalloc.start()
+    value = func()
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return value, size
+
+
+def read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_json(folder):
+    locale = os.path.join(folder, I18N, LOCALE)
+    data = read(os.path.join(folder, "src", "data.json"))
+    loaded = {"data": data}
+    for kind in ("hero", "artifact"):
+        names = read(os.path.join(locale, kind, "names.json"))
+        loaded[kind] = (names, {str(v): read(os.path.join(locale, kind, str(v) + ".json"))
+                                for v in names.values()})
+    return loaded
+
+
+def load_records(folder, scratch):
+    pack = DataPack(folder, os.path.join(scratch, "goblin.pack"))
+    data = pack.load()
+    text = LocaleText(LOCALE, DataPack(folder, os.path.join(scratch, "goblin-" + LOCALE + ".pack"), LOCALE),
+                      {}, data["hero"])
+    for id_ in text.heroes:
+        text.heroes[id_]
+    for id_ in text.artifacts:
+        text.artifacts[id_]
+    # the numbers the records do not copy stay in data
+    return data, text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--goblin", help="Mask-of-Goblin checkout, synthetic data by default")
+    parser.add_argument("--heroes", type=int, default=120, help="heroes in the synthetic data")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as scratch:
+        folder = args.goblin or write_dataset(os.path.join(scratch, "goblin"), args.heroes)
+        # build the packs first so only what stays loaded is measured
+        _, text = load_records(folder, scratch)
+        text.close()
+        loaded, before = held(lambda: load_json(folder))
+        del loaded
+        (_, text), after = held(lambda: load_records(folder, scratch))
+        text.close()
+
+    print("{:<10}{:>12}".format("", "KiB"))
+    print("{:<10}{:>12.1f}".format("json", before / 1024))
+    print("{:<10}{:>12.1f}{:>+9.0%}".format("records", after / 1024, after / before - 1))
+
+
+if __name__ == "__main__":
+    main()
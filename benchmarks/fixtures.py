@@ -0,0 +1,108 @@
+"""
+Board pages for the benchmarks.
+
+No recorded plug.game pages are shipped, none could be fetched where the
+suite was written, so `board_page` builds synthetic ones
+with the markup the parser reads, padded with the kind of navigation and
+script noise a real page carries around the feed. Pages saved from the site
+can be dropped into a folder and loaded with `load_pages`, to measure those
+instead with --pages.
+"""
+import os
+import random
+
+PAGE_HEAD = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<title>King's Raid | Plug</title>
+{scripts}
+</head>
+<body>
+<div id="wrap">
+<div class="header"><ul class="gnb">{menu}</ul></div>
+<div class="content">
+<div class="feed_list">
+"""
+
+PAGE_TAIL = """
+</div>
+</div>
+<div class="footer">{footer}</div>
+</div>
+</body>
+</html>
+"""
+
+POST = """<div class="frame_plug" data-articleid="{id}">
+    <div class="feed_head">
+        <a class="link_profile" href="/kingsraid/1030449/users/{user}">
+            <img class="thumb" src="https://cdn.plug.game/profile/{user}.png" alt="">
+        </a>
+        <a class="name" href="/kingsraid/1030449/users/{user}">
+            {author}
+        </a>
+        <span class="time">{views} views</span>
+        <span class="time">{age}</span>
+    </div>
+    <div class="feed_body">
+        <a class="link_feed" href="/kingsraid/1030449/posts/{id}">
+            <strong class="tit_feed">{title}</strong>
+            <p class="txt_feed">{description}</p>
+        </a>
+        {image}
+    </div>
+    <div class="feed_foot"><span class="like">{likes}</span><span class="comment">{comments}</span></div>
+</div>
+"""
+
+IMAGE = '<div class="img" style="background-image:url(https://cdn.plug.game/article/{id}.jpg)"></div>'
+
+WORDS = ("maintenance", "patch", "notes", "event", "hero", "update", "raid", "guild",
+         "reward", "&amp;", "compensation", "schedule", "season", "arena", "dragon")
+AGES = ("3 min ago", "42 min ago", "1 hr ago", "5 hr ago", "1 day ago", "Mar 12, 2019")
+
+
+def board_page(count, newest=1500000, seed=0):
+    """
+    A board page with `count` posts, the newest article id first.
+    """
+    rng = random.Random(seed)
+    posts = []
+    article_id = newest
+    for _ in range(count):
+        article_id -= rng.randint(1, 40)
+        posts.append(POST.format(
+            id=article_id,
+            user=rng.randint(1000, 9999),
+            author="  King's Raid  \n  GM  ",
+            views=rng.randint(100, 99999),
+            age=rng.choice(AGES),
+            title=" ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 10))),
+            description="\n    ".join(rng.choice(WORDS) for _ in range(rng.randint(20, 80))),
+            image=IMAGE.format(id=article_id) if rng.random() < 0.6 else "",
+            likes=rng.randint(0, 999),
+            comments=rng.randint(0, 999)))
+    scripts = "\n".join('<script src="/static/js/chunk.{}.js"></script>'.format(i)
+                        for i in range(30))
+    menu = "".join('<li><a href="/kingsraid/1030449/posts?menuId={0}">Menu {0}</a></li>'.format(i)
+                   for i in range(40))
+    footer = "<p>" + " ".join(WORDS * 20) + "</p>"
+    return (PAGE_HEAD.format(scripts=scripts, menu=menu) + "".join(posts)
+            + PAGE_TAIL.format(footer=footer))
+
+
+def synthetic_pages(sizes):
+    return {"synthetic-{}".format(size): board_page(size) for size in sizes}
+
+
+def load_pages(folder):
+    """
+    Saved board pages, one `.html` file per page.
+    """
+    pages = {}
+    for name in sorted(os.listdir(folder)):
+        if name.endswith(".html"):
+            with open(os.path.join(folder, name), encoding="utf-8") as f:
+                pages[name[:-5]] = f.read()
+    return pages
@@ -0,0 +1,125 @@
+"""
+A synthetic Mask-of-Goblin checkout for the KRInfo benchmarks.
+
+`write_dataset` lays out `src/data.json` and the English locale files the
+way KRInfo reads them, with made up heroes and artifacts, so the cog can be
+benchmarked without the submodule. Point the benchmarks at a real checkout
+to measure the real data instead.
+"""
+import json
+import os
+import random
+
+CLASSES = ("knight", "warrior", "assassin", "archer", "mechanic", "wizard", "priest")
+SYLLABLES = ("ka", "ri", "na", "el", "dor", "mi", "ra", "th", "an", "lu", "ve", "sha",
+             "gr", "io", "ne", "ru", "kas", "tel", "ph", "ae")
+WORDS = ("deals", "damage", "to", "enemies", "within", "range", "and", "increases", "ATK",
+         "by", "for", "sec", "Crit", "Chance", "of", "allies", "P.DEF", "M.DEF", "stun")
+
+
+def name(rng, taken):
+    while True:
+        word = "".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+        if word not in taken:
+            taken.add(word)
+            return word
+
+
+def sentence(rng, variables=0, low=12, high=40):
+    words = [rng.choice(WORDS) for _ in range(rng.randint(low, high))]
+    for i in range(variables):
+        words.insert(rng.randrange(len(words) + 1), "{" + str(i) + "}")
+    return " ".join(words) + "."
+
+
+def numbers(rng, count):
+    return [rng.choice((rng.randint(1, 3000), round(rng.uniform(0.1, 99.9), 1))) for _ in range(count)]
+
+
+def hero(rng, index, hero_name):
+    variables = {
+        "index": index,
+        "class": rng.choice(CLASSES),
+        "type": rng.choice(("physical", "magical")),
+        "auto": {"rangeType": rng.choice(("Melee", "Ranged")), "range": rng.randint(100, 900)},
+        "position": {"type": rng.choice(("front", "middle", "rear")), "weight": rng.randint(1, 99)},
+        "mpatk": rng.randint(50, 300),
+        "mpsec": rng.randint(5, 60),
+    }
+    locale = {
+        "name": hero_name,
+        "subtitle": "The " + rng.choice(WORDS).capitalize(),
+        "description": sentence(rng),
+        "like": rng.choice(WORDS),
+        "dislike": rng.choice(WORDS),
+        "story": sentence(rng, 0, 150, 300),
+        "uw": {"name": hero_name + "'s Weapon", "description": [sentence(rng) for _ in range(6)]},
+        "t5": {"light": sentence(rng, 2), "dark": sentence(rng, 2)},
+    }
+    variables["t5"] = {"light": numbers(rng, 2), "dark": numbers(rng, 2)}
+    for i in range(1, 5):
+        s = "s" + str(i)
+        skill_vars = {
+            "description": numbers(rng, 4),
+            "books": [numbers(rng, 1), numbers(rng, 1), numbers(rng, 2)],
+            "light": numbers(rng, 2),
+            "dark": numbers(rng, 2),
+        }
+        skill_locale = {
+            "name": name(rng, set()) + " " + rng.choice(WORDS).capitalize(),
+            "description": sentence(rng, 4),
+            "books": {"0": sentence(rng, 1, 4, 8), "1": sentence(rng, 1, 4, 8),
+                      "2": sentence(rng, 2, 4, 8)},
+            "light": sentence(rng, 2),
+            "dark": sentence(rng, 2),
+            "ut": {"name": name(rng, set()), "description": [sentence(rng) for _ in range(6)]},
+        }
+        if i < 4:
+            skill_vars["mana"] = i
+            skill_vars["cooldown"] = rng.randint(5, 30)
+        if rng.random() < 0.3:
+            skill_vars["linked"] = [numbers(rng, 2)]
+            skill_locale["linked"] = {"0": {"name": name(rng, set()), "description": sentence(rng, 2)}}
+        skill_vars["ut"] = {"stats": {stat: rng.randint(10, 400) for stat in
+                                      rng.sample(("atk", "hp", "crit", "pen", "aspd"), 2)}}
+        variables[s] = skill_vars
+        locale[s] = skill_locale
+    variables["uw"] = {"stats": {"atk": rng.randint(500, 3000), "hp": rng.randint(2000, 12000)}}
+    return variables, locale
+
+
+def write_json(path, value):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(value, f)
+
+
+def write_dataset(folder, heroes=120, artifacts=150, seed=0):
+    rng = random.Random(seed)
+    taken = set()
+    english = os.path.join(folder, "public", "i18n", "English")
+    data = {"hero": {}, "class": {}}
+    for cls in CLASSES:
+        data["class"][cls] = {"attributes": {stat: rng.randint(0, 300) for stat in
+                                             ("crit", "acc", "dodge", "pen", "aspd")}}
+
+    hero_names = {}
+    for index in range(1, heroes + 1):
+        hero_name = name(rng, taken)
+        hero_id = str(10000 + index)
+        data["hero"][hero_id], locale = hero(rng, index, hero_name)
+        hero_names[hero_name] = hero_id
+        write_json(os.path.join(english, "hero", hero_id + ".json"), locale)
+    write_json(os.path.join(english, "hero", "names.json"), hero_names)
+
+    artifact_names = {}
+    for index in range(1, artifacts + 1):
+        artifact_name = name(rng, taken) + " " + rng.choice(("Ring", "Cloak", "Orb", "Tome"))
+        artifact_id = str(20000 + index)
+        artifact_names[artifact_name] = artifact_id
+        write_json(os.path.join(english, "artifact", artifact_id + ".json"),
+                   {"name": artifact_name, "description": [sentence(rng, 0) for _ in range(6)]})
+    write_json(os.path.join(english, "artifact", "names.json"), artifact_names)
+
+    write_json(os.path.join(folder, "src", "data.json"), data)
+    return folder
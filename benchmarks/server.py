@@ -0,0 +1,92 @@
+"""
+A local stand-in for plug.game that serves benchmark pages.
+
+Every page is served at `/kingsraid/1030449/posts?menuId=<name>` with an
+ETag, so conditional requests get a 304 like the real site. Latency and
+failing responses can be added to see how the fetch stage behaves.
+"""
+import argparse
+import asyncio
+import hashlib
+import random
+
+from aiohttp import web
+
+from .fixtures import load_pages, synthetic_pages
+
+
+class BoardServer:
+    def __init__(self, pages, latency=0.0, status=200, error_rate=0.0, seed=0):
+        self.pages = {}
+        for name, page in pages.items():
+            body = page.encode("utf-8")
+            self.pages[name] = (body, '"{}"'.format(hashlib.sha1(body).hexdigest()))
+        self.latency = latency
+        self.status = status
+        self.error_rate = error_rate
+        self.rng = random.Random(seed)
+        self.runner = None
+        self.url = None
+
+    def board_url(self, name):
+        return "{}/kingsraid/1030449/posts?menuId={}".format(self.url, name)
+
+    async def handle(self, request):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        name = request.query.get("menuId")
+        if name not in self.pages:
+            return web.Response(status=404)
+        if self.status != 200 and self.rng.random() < self.error_rate:
+            return web.Response(status=self.status)
+        body, etag = self.pages[name]
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(body=body, content_type="text/html", charset="utf-8",
+                            headers={"ETag": etag})
+
+    async def start(self, host="127.0.0.1", port=0):
+        app = web.Application()
+        app.router.add_get("/kingsraid/1030449/posts", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = "http://{}:{}".format(host, port)
+        return self.url
+
+    async def stop(self):
+        await self.runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--pages", help="folder of saved board pages")
+    parser.add_argument("--sizes", type=int, nargs="*", default=[20, 100, 500])
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before each response")
+    parser.add_argument("--status", type=int, default=200, help="status of failing responses")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    pages = synthetic_pages(args.sizes)
+    if args.pages:
+        pages.update(load_pages(args.pages))
+    server = BoardServer(pages, args.latency, args.status, args.error_rate)
+
+    loop = asyncio.get_event_loop()
+    url = loop.run_until_complete(server.start(port=args.port))
+    for name in pages:
+        print(server.board_url(name))
+    print("Serving on {}, Ctrl+C to stop".format(url))
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        loop.run_until_complete(server.stop())
+
+
+if __name__ == "__main__":
+    main()
@@ -6,3 +6,4 @@ from .krinfo import KRInfo
 def setup(bot: Red):
     krinfo = KRInfo(bot)
     bot.add_cog(krinfo)
+    bot.loop.create_task(krinfo.watch_goblin())
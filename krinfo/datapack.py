@@ -0,0 +1,272 @@
+from collections.abc import Mapping
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+
+from .uniques import compute
+
+MAGIC = b"KRPACK3\n"
+HEADER = struct.Struct("<Q")
+I18N = "public/i18n"
+
+
+class PackedMapping(Mapping):
+    """
+    A read only dict of packed entries, each decoded the first time it is used.
+
+    `build(key, entry)` turns decoded entries into what is kept, and without
+    `keep` every lookup decodes again for callers that keep their own copy.
+    """
+
+    def __init__(self, pack, prefix, keys, build=None, keep=True):
+        self.pack = pack
+        self.prefix = prefix
+        self.ids = keys
+        self.build = build
+        self.keep = keep
+        self.decoded = {}
+
+    def __getitem__(self, key):
+        key = str(key)
+        try:
+            return self.decoded[key]
+        except KeyError:
+            pass
+        value = self.pack.decode(self.prefix + key)
+        if self.build is not None:
+            value = self.build(key, value)
+        if self.keep:
+            self.decoded[key] = value
+        return value
+
+    def __contains__(self, key):
+        return self.prefix + str(key) in self.pack.index
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+
+class DataPack:
+    """
+    The Mask-of-Goblin files KRInfo reads, compiled into one file, either
+    data.json or the text of one locale.
+
+    The pack is a JSON index of (offset, length) pairs followed by every hero,
+    artifact and data.json entry as its own JSON blob. It is memory mapped and
+    entries are only decoded when asked for, so loading does not depend on how
+    many heroes there are. It is built again whenever the fingerprint of the
+    source files stops matching the one it was built from.
+
+    The header also keeps a manifest of the size, mtime and hash of every
+    source file and the entries made from it. Building from a previous pack
+    only parses the files whose contents changed and copies the rest.
+
+    Every build is written next to `path` under a name of its own, as a
+    file that is mapped cannot be replaced on Windows.
+    """
+
+    def __init__(self, source, path, locale=None):
+        self.source = source
+        self.path = path
+        self.locale = locale
+        # the build the pack was opened from
+        self.file = None
+        self.map = None
+        self.index = {}
+        self.manifest = {}
+        # fingerprint of the files the open pack was built from, and how many
+        # of them had to be parsed if it was just built
+        self.built_from = None
+        self.parsed = 0
+
+    def load(self, previous=None, records=None):
+        """
+        data, or hero_names, heroes, artifact_names, artifacts for a locale,
+        the same as reading the files directly. `records` maps "hero" and
+        "artifact" to the `build` of their mappings.
+        """
+        fingerprint = self.fingerprint()
+        if not self.open(fingerprint):
+            self.parsed = self.build(fingerprint, previous)
+            if not self.open(fingerprint):
+                raise RuntimeError("Could not read back " + self.file)
+        if previous is None:
+            self.remove_stale()
+        if self.locale is None:
+            data = self.decode("data")
+            # every locale builds its hero records from these, none of them keeps the dicts
+            data["hero"] = PackedMapping(self, "data/hero/", self.decode("data/heroes"), keep=False)
+            return data
+        records = records or {}
+        hero_names = self.decode("hero/names")
+        artifact_names = self.decode("artifact/names")
+        heroes = PackedMapping(self, "hero/", [str(v) for v in hero_names.values()], records.get("hero"))
+        artifacts = PackedMapping(self, "artifact/", [str(v) for v in artifact_names.values()],
+                                  records.get("artifact"))
+        return hero_names, heroes, artifact_names, artifacts
+
+    def fingerprint(self):
+        # sizes and mtimes are enough to notice a submodule update
+        digest = hashlib.sha1(MAGIC)
+        files = []
+        if self.locale is None:
+            files.append(os.path.join(self.source, "src", "data.json"))
+        else:
+            for folder in ("hero", "artifact"):
+                folder = os.path.join(self.source, I18N, self.locale, folder)
+                files += [os.path.join(folder, name) for name in sorted(os.listdir(folder))]
+        for path in files:
+            stat = os.stat(path)
+            digest.update("{}\0{}\0{}\n".format(os.path.relpath(path, self.source), stat.st_size,
+                                                stat.st_mtime_ns).encode("utf-8"))
+        return digest.hexdigest()
+
+    def versioned(self, fingerprint):
+        root, ext = os.path.splitext(self.path)
+        return "{}.{}{}".format(root, fingerprint[:16], ext)
+
+    def open(self, fingerprint):
+        self.close()
+        self.file = self.versioned(fingerprint)
+        try:
+            with open(self.file, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    return False
+                length, = HEADER.unpack(f.read(HEADER.size))
+                header = json.loads(f.read(length).decode("utf-8"))
+                if header["fingerprint"] != fingerprint:
+                    return False
+                self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError, KeyError, struct.error):
+            return False
+        start = len(MAGIC) + HEADER.size + length
+        self.index = {key: (start + offset, size) for key, (offset, size) in header["index"].items()}
+        self.manifest = header.get("manifest", {})
+        self.built_from = fingerprint
+        return True
+
+    def decode(self, key):
+        return json.loads(self.blob(key).decode("utf-8"))
+
+    def build(self, fingerprint, previous=None):
+        """
+        Writes the pack, reusing the entries of files unchanged since `previous`.
+        Returns how many source files had to be parsed.
+        """
+        entries = []
+        manifest = {}
+        parsed = 0
+
+        def add(key, value):
+            entries.append((key, json.dumps(value, ensure_ascii=False,
+                                            separators=(",", ":")).encode("utf-8")))
+
+        def read(path):
+            # the parsed file, or None when its entries were copied from previous
+            nonlocal parsed
+            full = os.path.join(self.source, path)
+            stat = os.stat(full)
+            old = previous.manifest.get(path) if previous is not None else None
+            raw = None
+            if old is not None and old[0] == stat.st_size and old[1] == stat.st_mtime_ns:
+                digest = old[2]
+            else:
+                with open(full, "rb") as f:
+                    raw = f.read()
+                digest = hashlib.sha1(raw).hexdigest()
+            # entries of a file are added right after it is read, from this position
+            manifest[path] = [stat.st_size, stat.st_mtime_ns, digest, len(entries)]
+            if old is not None and old[2] == digest and all(key in previous.index for key in old[3]):
+                entries.extend((key, previous.blob(key)) for key in old[3])
+                return None
+            if raw is None:
+                with open(full, "rb") as f:
+                    raw = f.read()
+            parsed += 1
+            return json.loads(raw.decode("utf-8"))
+
+        if self.locale is None:
+            data = read("src/data.json")
+            if data is not None:
+                heroes = data.pop("hero", {})
+                add("data", data)
+                add("data/heroes", list(heroes))
+                # every unique weapon and treasure stat, so loading never goes through the heroes
+                add("data/uniques", compute(heroes))
+                for hero_id, hero in heroes.items():
+                    add("data/hero/" + hero_id, hero)
+        for folder in ("hero", "artifact") if self.locale is not None else ():
+            prefix = I18N + "/" + self.locale + "/" + folder + "/"
+            names = read(prefix + "names.json")
+            if names is None:
+                names = previous.decode(folder + "/names")
+            else:
+                add(folder + "/names", names)
+            for value in names.values():
+                entry = read(prefix + str(value) + ".json")
+                if entry is not None:
+                    add(folder + "/" + str(value), entry)
+
+        ends = [row[3] for row in manifest.values()][1:] + [len(entries)]
+        for row, end in zip(manifest.values(), ends):
+            row[3] = [key for key, _ in entries[row[3]:end]]
+
+        index = {}
+        offset = 0
+        for key, blob in entries:
+            index[key] = (offset, len(blob))
+            offset += len(blob)
+        header = json.dumps({"fingerprint": fingerprint, "index": index,
+                             "manifest": manifest}).encode("utf-8")
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as f:
+            f.write(MAGIC)
+            f.write(HEADER.pack(len(header)))
+            f.write(header)
+            for _, blob in entries:
+                f.write(blob)
+        os.replace(temp, self.versioned(fingerprint))
+        return parsed
+
+    def blob(self, key):
+        offset, size = self.index[key]
+        return self.map[offset:offset + size]
+
+    def remove_stale(self):
+        # builds other than this one, left from before a restart
+        folder, name = os.path.split(os.path.abspath(self.path))
+        root, ext = os.path.splitext(name)
+        stale = re.compile(re.escape(root) + r"(\.[0-9a-f]{16})?" + re.escape(ext))
+        for entry in os.listdir(folder):
+            path = os.path.join(folder, entry)
+            if stale.fullmatch(entry) and path != os.path.abspath(self.file):
+                self.remove(path)
+
+    def discard(self):
+        """
+        Closes the pack and deletes its file, once a newer build took over.
+        """
+        self.close()
+        if self.file is not None:
+            self.remove(self.file)
+
+    @staticmethod
+    def remove(path):
+        try:
+            os.remove(path)
+        except OSError:
+            # still mapped by something else on Windows, a later start removes it
+            pass
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+        self.map = None
+        self.index = {}
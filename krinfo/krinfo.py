@@ -1,74 +1,103 @@
 import asyncio
+from collections import OrderedDict
 from typing import Any
-import json
 import os
 import re
+import time
 
 import discord
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
-from fuzzywuzzy import fuzz, process
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box, pagify
+
+from .datapack import I18N, DataPack
+from .texts import LocaleText
+from .uniques import UniqueTable, unique
 
 
 Cog: Any = getattr(commands, "Cog", object)
 
+PLACEHOLDER = re.compile(r"\{(0|[1-9][0-9]*)\}")
+
 
 class KRInfo(Cog):
+    SKILLS = ("s1", "s2", "s3", "s4")
+    MISSING = "*Not in the data yet.*"
+    EMBED_CACHE_SIZE = 256
+    MIN_WATCH_INTERVAL = 10
+    DEFAULT_LOCALE = "English"
+    # locales kept loaded besides the default one, and how long they stay unused
+    MAX_LOCALES = 4
+    LOCALE_IDLE = 3600
+
     def __init__(self, bot: Red):
         self.bot = bot
-        self.data, self.hero_names, self.heroes, self.artifact_names, self.artifacts = self.load_files()
+        self.pack = None
+        # template -> compiled segments, and (locale, id, command, stars) -> finished embed
+        self.templates = {}
+        self.embeds = OrderedDict()
+        # kind -> {alias: name} set by the owner, read from config on first use
+        self.aliases = None
+        # locale -> LocaleText, least recently used first
+        self.locales = OrderedDict()
+        self.load_files()
+        # held while the data is rebuilt or another locale is loaded
+        self.reload_lock = asyncio.Lock()
+        # seconds between checks for changed Mask-of-Goblin files, 0 to not check
+        self.watch_interval = 0
         self.config = Config.get_conf(
             self, identifier=107114105110102111, force_registration=True)
+        self.config.register_global(aliases={"hero": {}, "artifact": {}}, watch_interval=0)
+        self.config.register_guild(locale=self.DEFAULT_LOCALE)
+
+    def cog_unload(self):
+        if self.pack is not None:
+            self.pack.close()
+        for text in self.locales.values():
+            text.close()
+
+    __unload = cog_unload
 
     @commands.command(name="skills", aliases=["skill"])
-    async def skills(self, ctx: commands.Context, hero: str):
+    async def skills(self, ctx: commands.Context, *, hero: str):
         """
         Shows the skills of a hero `%skills <hero>`
         """
         await self.reply(ctx=ctx, func=self.get_skill, hero=hero)
 
     @commands.command(name="books", aliases=["book"])
-    async def books(self, ctx: commands.Context, hero: str):
+    async def books(self, ctx: commands.Context, *, hero: str):
         """
         Shows the book upgrade on skills of a hero `%books <hero>`
         """
         await self.reply(ctx=ctx, func=self.get_books, hero=hero)
 
     @commands.command(name="perks", aliases=["perk", "transcend"])
-    async def perks(self, ctx: commands.Context, hero: str):
+    async def perks(self, ctx: commands.Context, *, hero: str):
         """
         Shows the transcend skills of a hero `%perks <hero>`
         """
         await self.reply(ctx=ctx, func=self.get_perks, hero=hero)
 
     @commands.command()
-    async def ut(self, ctx: commands.Context, hero: str, stars: str = "0"):
+    async def ut(self, ctx: commands.Context, *, hero: str):
         """
-        Shows the UTs of a hero `%ut <hero> <stars>`, defaults to 0 star UT
+        Shows the UTs of a hero `%ut <hero> <stars>`, defaults to 0 star UT, with stats at 1 to 5 stars
         """
-        try:
-            stars = int(stars)
-        except:
-            stars = 0
-        if stars < 0 or stars > 5:
-            stars = 0
+        hero, stars = self.split_stars(hero)
         await self.reply(ctx=ctx, func=self.get_ut, hero=hero, stars=stars)
 
     @commands.command()
-    async def uw(self, ctx: commands.Context, hero: str, stars: str = "0"):
+    async def uw(self, ctx: commands.Context, *, hero: str):
         """
-        Shows the UW of a hero `%uw <hero> <stars>`, defaults to 0 star UW
+        Shows the UW of a hero `%uw <hero> <stars>`, defaults to 0 star UW, with stats at 1 to 5 stars
         """
-        try:
-            stars = int(stars)
-        except:
-            stars = 0
-        if stars < 0 or stars > 5:
-            stars = 0
+        hero, stars = self.split_stars(hero)
         await self.reply(ctx=ctx, func=self.get_uw, hero=hero, stars=stars)
 
     @commands.command(name="hero")
-    async def hero(self, ctx: commands.Context, hero: str):
+    async def hero(self, ctx: commands.Context, *, hero: str):
         """
         Shows basic data of a hero `%hero <hero>`
         """
@@ -79,163 +108,336 @@ class KRInfo(Cog):
         """
         Shows basic data of an artifact `%artifact <artifact> <stars>`, defaults to 0 star artifact
         """
-        temp = artifact.rsplit(" ", 1)
-        if len(temp) == 2 and str.isdigit(temp[1]):
-            stars = int(temp[1])
-            artifact = temp[0]
-        else:
-            stars = 0
-        if stars < 0 or stars > 5:
-            stars = 0
-        results = self.fuzzysearch(
-            artifact.lower().capitalize(), self.artifact_names)
-        if results[1] > 50:
-            await ctx.send(embed=self.get_artifact(results[0], stars))
+        artifact, stars = self.split_stars(artifact)
+        await self.load_aliases()
+        text = await self.guild_text(ctx.guild)
+        results = self.fuzzysearch(artifact, text.index("artifact"))
+        if results and results[1] > 50:
+            await ctx.send(embed=self.cached_embed(
+                text, text.artifact_names[results[0]], self.get_artifact, results[0], stars))
         else:
             await ctx.send(f"Unable to locate {artifact}.")
 
+    @commands.command()
+    @commands.is_owner()
+    async def addalias(self, ctx: commands.Context, kind: str, alias: str, *, name: str):
+        """
+        Adds a nickname for a hero or artifact `%addalias hero <alias> <name>`
+        """
+        kind = kind.lower()
+        if kind not in ("hero", "artifact"):
+            await ctx.send("Aliases are for a hero or an artifact.")
+            return
+        await self.load_aliases()
+        # saved with the default locale's names, they work in every locale
+        results = self.fuzzysearch(name, self.default.index(kind))
+        if not results or results[1] <= 50:
+            await ctx.send(f"Unable to locate {name}.")
+            return
+        async with self.config.aliases() as aliases:
+            aliases[kind][alias] = results[0]
+        self.aliases[kind][alias] = results[0]
+        self.update_aliases()
+        await ctx.send(f"{alias} now finds {results[0]}.")
+
+    @commands.command()
+    @commands.is_owner()
+    async def removealias(self, ctx: commands.Context, kind: str, *, alias: str):
+        """
+        Removes a nickname of a hero or artifact `%removealias hero <alias>`
+        """
+        kind = kind.lower()
+        await self.load_aliases()
+        if alias not in self.aliases.get(kind, {}):
+            await ctx.send(f"There is no {kind} alias {alias}.")
+            return
+        async with self.config.aliases() as aliases:
+            aliases[kind].pop(alias, None)
+        del self.aliases[kind][alias]
+        self.update_aliases()
+        await ctx.send(f"Removed {alias}.")
+
+    @commands.command()
+    async def listaliases(self, ctx: commands.Context):
+        """
+        Lists the nicknames of heroes and artifacts
+        """
+        await self.load_aliases()
+        lines = [f"{kind} {alias}: {name}" for kind in ("hero", "artifact")
+                 for alias, name in sorted(self.aliases[kind].items())]
+        if not lines:
+            await ctx.send("No aliases yet.")
+            return
+        for page in pagify("\n".join(lines)):
+            await ctx.send(box(page))
+
+    @commands.command()
+    @checks.mod_or_permissions(administrator=True)
+    @commands.guild_only()
+    async def setlocale(self, ctx: commands.Context, *, locale: str):
+        """
+        Sets the language of hero and artifact info in this server `%setlocale English`
+        """
+        available = self.available_locales()
+        match = next((name for name in available if name.lower() == locale.lower()), None)
+        if match is None:
+            await ctx.send("Unknown locale, try one of: " + ", ".join(available))
+            return
+        await self.config.guild(ctx.guild).locale.set(match)
+        await ctx.send(f"Hero and artifact info in this server is now in {match}.")
+
+    @commands.command()
+    @commands.is_owner()
+    async def reloadgoblin(self, ctx: commands.Context):
+        """
+        Picks up changes to the Mask-of-Goblin files without reloading the cog
+        """
+        start = time.monotonic()
+        parsed = await self.reload_data()
+        if parsed is None:
+            await ctx.send("Mask-of-Goblin data is already up to date.")
+        else:
+            await ctx.send("Reloaded Mask-of-Goblin data, {} changed files parsed in {:.0f}ms.".format(
+                parsed, (time.monotonic() - start) * 1000))
+
+    @commands.command()
+    @commands.is_owner()
+    async def watchgoblin(self, ctx: commands.Context, seconds: int):
+        """
+        Checks the Mask-of-Goblin files for changes every `seconds`, 0 turns it off
+        """
+        if seconds != 0 and seconds < self.MIN_WATCH_INTERVAL:
+            await ctx.send(f"Checks can be at most every {self.MIN_WATCH_INTERVAL} seconds.")
+            return
+        self.watch_interval = seconds
+        await self.config.watch_interval.set(seconds)
+        if seconds:
+            await ctx.send(f"Checking for changed files every {seconds} seconds.")
+        else:
+            await ctx.send("No longer checking for changed files.")
+
+    async def watch_goblin(self):
+        self.watch_interval = await self.config.watch_interval()
+        while True:
+            await asyncio.sleep(self.watch_interval or 60)
+            if self is not self.bot.get_cog("KRInfo"):
+                print("Mask-of-Goblin watcher canceled, cog has been lost")
+                return
+            if not self.watch_interval:
+                continue
+            try:
+                parsed = await self.reload_data()
+            except Exception as e:
+                print("Mask-of-Goblin reload failed: " + str(e))
+                continue
+            if parsed is not None:
+                print(f"Reloaded Mask-of-Goblin data, {parsed} changed files parsed")
+
+    async def reload_data(self):
+        """
+        Builds the new data next to the live one and swaps it in, returns how
+        many files had to be parsed or None if nothing changed.
+        """
+        async with self.reload_lock:
+            loop = asyncio.get_running_loop()
+            packs = [self.pack] + [text.pack for text in self.locales.values()]
+            if not await loop.run_in_executor(None, self.changed, packs):
+                return None
+            await self.load_aliases()
+            pack, data, uniques, locales = await loop.run_in_executor(
+                None, self.build_store, list(self.locales.values()), self.alias_ids())
+            # one synchronous step, so no command ever sees half of each
+            self.pack = pack
+            self.data = data
+            self.uniques = uniques
+            self.locales = locales
+            self.default = locales[self.DEFAULT_LOCALE]
+            self.templates = {}
+            self.embeds = OrderedDict()
+            # builds nothing reads any more are deleted, unchanged ones were reopened
+            live = {pack.file} | {text.pack.file for text in locales.values()}
+            for old in packs:
+                if old.file in live:
+                    old.close()
+                else:
+                    old.discard()
+            return pack.parsed + sum(text.pack.parsed for text in locales.values())
+
+    def changed(self, packs):
+        return any(pack.fingerprint() != pack.built_from for pack in packs)
+
+    def build_store(self, texts, aliases):
+        # runs in an executor, only reads the live packs to copy what did not change
+        pack = DataPack(self.source, self.pack.path)
+        data = pack.load(previous=self.pack)
+        uniques = UniqueTable(pack)
+        locales = OrderedDict()
+        for text in texts:
+            locales[text.name] = new = self.load_locale(text.name, aliases, data, text)
+            new.used = text.used
+            # indexes in use are ready before the swap
+            for kind in text.indexes:
+                new.index(kind)
+        return pack, data, uniques, locales
+
+    def load_locale(self, locale, aliases, data, previous=None):
+        pack = DataPack(self.source, os.path.join(self.folder, "goblin-" + locale + ".pack"), locale)
+        return LocaleText(locale, pack, aliases, data["hero"], previous.pack if previous is not None else None)
+
+    def available_locales(self):
+        folder = os.path.join(self.source, I18N)
+        return sorted(name for name in os.listdir(folder)
+                      if os.path.isfile(os.path.join(folder, name, "hero", "names.json")))
+
+    async def guild_text(self, guild):
+        locale = self.DEFAULT_LOCALE if guild is None else await self.config.guild(guild).locale()
+        text = self.locales.get(locale)
+        if text is None:
+            async with self.reload_lock:
+                text = self.locales.get(locale)
+                if text is None:
+                    loop = asyncio.get_running_loop()
+                    try:
+                        text = await loop.run_in_executor(None, self.load_locale, locale, self.alias_ids(), self.data)
+                        self.locales[locale] = text
+                    except (OSError, ValueError) as e:
+                        print(f"Could not load locale {locale}: {e}")
+                        text = self.default
+        text.used = time.monotonic()
+        self.locales.move_to_end(text.name)
+        self.evict_locales()
+        return text
+
+    def evict_locales(self):
+        # a rebuild might still be copying from them
+        if self.reload_lock.locked():
+            return
+        now = time.monotonic()
+        for name, text in list(self.locales.items()):
+            if name == self.DEFAULT_LOCALE:
+                continue
+            if len(self.locales) > self.MAX_LOCALES + 1 or now - text.used > self.LOCALE_IDLE:
+                del self.locales[name]
+                text.close()
+
     async def reply(self, ctx, func, hero: str, stars: int=None):
-        hero_ = hero.lower().capitalize()
-        results = self.fuzzysearch(hero_, self.hero_names)
-        if results[1] < 50:
+        await self.load_aliases()
+        text = await self.guild_text(ctx.guild)
+        results = self.fuzzysearch(hero, text.index("hero"))
+        if not results or results[1] < 50:
             hero_ = hero
         else:
             hero_ = results[0]
-        if self.check_hero(hero_):
-            if type(stars) is int:
-                emb = func(hero_, stars)
-            else:
-                emb = func(hero_)
-            await ctx.send(embed=emb)
+        if self.check_hero(hero_, text):
+            await ctx.send(embed=self.cached_embed(text, text.hero_names[hero_], func, hero_, stars))
         else:
             await ctx.send(f"Unable to locate {hero}.")
 
-    def get_artifact(self, artifact, stars):
-        artifact_locale = self.get_artifact_locale(artifact)
-        skill_str = ""
-        skill_str += artifact_locale["description"][stars] + "\n"
-        title = artifact_locale["name"]
-        id_ = self.artifact_names[artifact]
-        return self.get_arti_embed(title, id_, skill_str)
-
-    def get_skill(self, hero):
-        def parse_skill(skill_vars, skill_locale, skill_num):
-            skill_str = ""
-            skill_str += self.bold(skill_num.upper() + ": " +
-                                   skill_locale["name"]) + "\n"
-            if "mana" in skill_vars:
-                skill_str += "mana: " + str(skill_vars["mana"]) + "\n"
-            if "cooldown" in skill_vars:
-                skill_str += "cooldown: " + str(skill_vars["cooldown"]) + "s\n"
-            skill_str += self.parse_vars(skill_locale["description"],
-                                         skill_vars["description"]) + "\n"
-            if "linked" in skill_vars:
-                for i, linked in enumerate(skill_vars["linked"]):
-                    skill_str += self.bold(skill_locale["linked"][str(i)]["name"] +
-                                           " (" + skill_num.upper() + " linked skill)") + "\n"
-                    skill_str += self.parse_vars(skill_locale["linked"]
-                                                 [str(i)]["description"], linked) + "\n"
-            skill_str += "\n"
-            return skill_str
-        hero_vars, hero_locale = self.get_hero(hero)
-        skill_str = ""
-        for i in range(1, 5):
-            s = "s" + str(i)
-            skill_str += parse_skill(hero_vars[s], hero_locale[s], s)
-        title = hero_locale["name"] + ", " + hero_locale["subtitle"]
-        id_ = hero_vars["index"]
-        return self.get_embed(title, id_, skill_str)
-
-    def get_books(self, hero):
-        hero_vars, hero_locale = self.get_hero(hero)
-        skill_str = ""
-        for i in range(1, 5):
-            s = "s" + str(i)
-            skill_str += self.bold(s.upper()) + "\n"
-            skill_str += self.parse_vars(hero_locale[s]["books"]
-                                         ["0"], hero_vars[s]["books"][0]) + "\n"
-            skill_str += self.parse_vars(hero_locale[s]["books"]
-                                         ["1"], hero_vars[s]["books"][1]) + "\n"
-            skill_str += self.parse_vars(hero_locale[s]["books"]
-                                         ["2"], hero_vars[s]["books"][2]) + "\n\n"
-        title = hero_locale["name"] + ", " + hero_locale["subtitle"]
-        id_ = hero_vars["index"]
-        return self.get_embed(title, id_, skill_str)
-
-    def get_perks(self, hero):
-        hero_vars, hero_locale = self.get_hero(hero)
-        skill_str = ""
-        for i in range(1, 5):
-            s = "s" + str(i)
-            skill_str += self.bold(s.upper() + " Light") + "\n"
-            skill_str += self.parse_vars(hero_locale[s]
-                                         ["light"], hero_vars[s]["light"]) + "\n"
-            skill_str += self.bold(s.upper() + " Dark") + "\n"
-            skill_str += self.parse_vars(hero_locale[s]
-                                         ["dark"], hero_vars[s]["dark"]) + "\n\n"
-        skill_str += self.bold("T5 Light") + "\n"
-        skill_str += self.parse_vars(hero_locale["t5"]
-                                     ["light"], hero_vars["t5"]["light"]) + "\n"
-        skill_str += self.bold("T5 Dark") + "\n"
-        skill_str += self.parse_vars(hero_locale["t5"]
-                                     ["dark"], hero_vars["t5"]["dark"]) + "\n"
-        title = hero_locale["name"] + ", " + hero_locale["subtitle"]
-        id_ = hero_vars["index"]
-        return self.get_embed(title, id_, skill_str)
-
-    def get_uw(self, hero, stars):
-        hero_vars, hero_locale = self.get_hero(hero)
-        skill_str = ""
-        skill_str += self.bold(hero_locale["uw"]["name"]) + "\n"
-        skill_str += hero_locale["uw"]["description"][stars] + "\n"
-        title = hero_locale["name"] + ", " + hero_locale["subtitle"]
-        id_ = hero_vars["index"]
-        return self.get_embed(title, id_, skill_str)
-
-    def get_ut(self, hero, stars):
-        hero_vars, hero_locale = self.get_hero(hero)
-        skill_str = ""
-        for i in range(1, 5):
-            s = "s" + str(i)
-            skill_str += self.bold(s.upper() + ": " +
-                                   hero_locale[s]["ut"]["name"]) + "\n"
-            skill_str += hero_locale[s]["ut"]["description"][stars] + "\n\n"
-        title = hero_locale["name"] + ", " + hero_locale["subtitle"]
-        id_ = hero_vars["index"]
-        return self.get_embed(title, id_, skill_str)
-
-    def get_story(self, hero):
-        hero_vars, hero_locale = self.get_hero(hero)
-        story_str = "*" + hero_locale["description"] + "*"
-        class_str = hero_vars["class"].capitalize(
-        ) + " / " + hero_vars["type"].capitalize() + "\n"
-        ranged = hero_vars["auto"]["rangeType"]
+    def get_artifact(self, artifact, stars, text=None):
+        record = self.get_artifact_locale(artifact, text)
+        return self.get_arti_embed(record.name, record.id, record.description[stars] + "\n")
+
+    def get_skill(self, hero, text=None):
+        def parse_skill(skill, skill_num):
+            lines = [self.bold(skill_num.upper() + ": " + skill.name)]
+            if skill.mana is not None:
+                lines.append("mana: " + str(skill.mana))
+            if skill.cooldown is not None:
+                lines.append("cooldown: " + str(skill.cooldown) + "s")
+            lines.append(self.parse_vars(skill.description, skill.values))
+            for name, description, values in skill.linked or ():
+                lines.append(self.bold(name + " (" + skill_num.upper() + " linked skill)"))
+                lines.append(self.parse_vars(description, values))
+            return "\n".join(lines) + "\n\n"
+        record = self.get_hero(hero, text)
+        if record.skills is None:
+            return self.get_missing(record, "skills")
+        skill_str = "".join(parse_skill(skill, s) for s, skill in zip(self.SKILLS, record.skills))
+        return self.get_embed(record.name + ", " + record.subtitle, record.index, skill_str)
+
+    def get_books(self, hero, text=None):
+        record = self.get_hero(hero, text)
+        if record.skills is None:
+            return self.get_missing(record, "skills")
+        parts = []
+        for s, skill in zip(self.SKILLS, record.skills):
+            parts += [self.bold(s.upper()), "\n"]
+            for book in skill.books or ():
+                parts += [self.parse_vars(book.text, book.values), "\n"]
+            if skill.books is None:
+                parts += [self.MISSING, "\n"]
+            parts.append("\n")
+        return self.get_embed(record.name + ", " + record.subtitle, record.index, "".join(parts))
+
+    def get_perks(self, hero, text=None):
+        record = self.get_hero(hero, text)
+        parts = []
+        for s, skill in zip(self.SKILLS, record.skills or ()):
+            parts += self.transcend_parts(s.upper(), skill.transcend) + ["\n"]
+        if record.skills is None:
+            parts += [self.bold("Skills"), "\n", self.MISSING, "\n\n"]
+        parts += self.transcend_parts("T5", record.t5)
+        return self.get_embed(record.name + ", " + record.subtitle, record.index, "".join(parts))
+
+    def transcend_parts(self, name, transcend):
+        if transcend is None:
+            return [self.bold(name + " Light / Dark"), "\n", self.MISSING, "\n"]
+        return [self.bold(name + " Light"), "\n", self.parse_vars(transcend.light, transcend.light_values), "\n",
+                self.bold(name + " Dark"), "\n", self.parse_vars(transcend.dark, transcend.dark_values), "\n"]
+
+    def get_uw(self, hero, stars, text=None):
+        record = self.get_hero(hero, text)
+        if record.uw is None:
+            return self.get_missing(record, "unique weapon")
+        skill_str = self.bold(record.uw_name) + "\n" + record.uw[stars] + "\n"
+        fields = {}
+        table = self.uniques.table(record.id, "uw")
+        if table:
+            fields["Level 90 stats"] = {"s": box(table), "inline": False}
+        return self.get_embed(record.name + ", " + record.subtitle, record.index, skill_str, fields)
+
+    def get_ut(self, hero, stars, text=None):
+        record = self.get_hero(hero, text)
+        if record.skills is None:
+            return self.get_missing(record, "skills")
+        parts = []
+        fields = {}
+        for s, skill in zip(self.SKILLS, record.skills):
+            ut = self.MISSING if skill.ut is None else skill.ut[stars]
+            parts += [self.bold(s.upper() + ": " + skill.ut_name), "\n", ut, "\n\n"]
+            table = self.uniques.table(record.id, s)
+            if table:
+                fields[s.upper() + " level 90 stats"] = {"s": box(table), "inline": False}
+        return self.get_embed(record.name + ", " + record.subtitle, record.index, "".join(parts), fields)
+
+    def get_story(self, hero, text=None):
+        record = self.get_hero(hero, text)
+        story_str = "*" + record.description + "*"
+        ranged = record.range_type
         if ranged == "Ranged":
-            ranged += "-" + str(hero_vars["auto"]["range"])
-        class_str += ranged + " / " + \
-            hero_vars["position"]["type"].capitalize(
-            ) + "-" + str(hero_vars["position"]["weight"])
-        index_str = self.bold("Gender") + ": " + "WIP\n"
-        index_str += self.bold("Age") + ": " + "WIP\n"
-        index_str += self.bold("Height") + ": " + "WIP\n"
-        index_str += self.bold("Race") + ": " + "WIP\n"
-        index_str += self.bold("Birthday") + ": " + "WIP\n"
-        index_str += self.bold("Likes") + ": " + hero_locale["like"] + "\n"
-        index_str += self.bold("Dislikes") + ": " + hero_locale["dislike"]
-        additional_str = "Mp/Atk: " + str(hero_vars["mpatk"]) + "\n"
-        additional_str += "Mp/Sec: " + str(hero_vars["mpsec"]) + "\n"
-        for k, v in self.data["class"][hero_vars["class"]]["attributes"].items():
-            additional_str += k.capitalize() + ": " + str(v) + "\n"
-        additional_str = additional_str.strip()
+            ranged += "-" + str(record.range)
+        class_str = "".join([
+            record.cls.capitalize(), " / ", record.type.capitalize(), "\n",
+            ranged, " / ", record.position.capitalize(), "-", str(record.weight)])
+        index_str = "\n".join([self.bold(k) + ": WIP" for k in ("Gender", "Age", "Height", "Race", "Birthday")] +
+                              [self.bold("Likes") + ": " + record.like,
+                               self.bold("Dislikes") + ": " + record.dislike])
+        additional = ["Mp/Atk: " + str(record.mpatk), "Mp/Sec: " + str(record.mpsec)]
+        for k, v in self.data["class"].get(record.cls, {}).get("attributes", {}).items():
+            additional.append(k.capitalize() + ": " + str(v))
+        additional_str = "\n".join(additional).strip()
         fields = {
             "Class Info": {"s": class_str, "inline": False},
             "Main Stats": {"s": "WIP", "inline": True},
             "Additional Stats": {"s": additional_str, "inline": True},
             "Hero Index": {"s": index_str, "inline": False},
-            "Story": {"s": self.trimlen(hero_locale["story"]), "inline": False}
+            "Story": {"s": self.trimlen(record.story), "inline": False}
         }
-        id_ = hero_vars["index"]
-        return self.get_embed(hero, id_, story_str, fields)
+        return self.get_embed(hero, record.index, story_str, fields)
+
+    def get_missing(self, record, part):
+        return self.get_embed(record.name + ", " + record.subtitle, record.index,
+                              "No " + part + " for this hero. " + self.MISSING)
 
     def trimlen(self, s):
         if len(s) > 1024:
@@ -265,53 +467,100 @@ class KRInfo(Cog):
         return "**" + string_ + "**"
 
     def parse_vars(self, string_, vars_):
-        if vars_ is not None:
-            for i, var in enumerate(vars_):
-                string_ = string_.replace("{" + str(i) + "}", str(var))
-        return string_
+        if vars_ is None:
+            return string_
+        segments = self.templates.get(string_)
+        if segments is None:
+            segments = self.compile_template(string_)
+        # placeholders past the end of vars_ are left as they are
+        return "".join(segment if type(segment) is str else
+                       str(vars_[segment]) if segment < len(vars_) else "{" + str(segment) + "}"
+                       for segment in segments)
+
+    def compile_template(self, string_):
+        # "deals {0} damage" -> ("deals ", 0, " damage"), literal text and var indices
+        parts = PLACEHOLDER.split(string_)
+        segments = tuple(part if i % 2 == 0 else int(part) for i, part in enumerate(parts) if part)
+        self.templates[string_] = segments
+        return segments
 
-    def check_hero(self, hero):
-        return True if hero in self.hero_names else False
+    def check_hero(self, hero, text=None):
+        return True if hero in (text or self.default).hero_names else False
 
-    def get_hero(self, hero):
-        hero_id = self.hero_names[hero]
-        hero_vars = self.data["hero"][hero_id]
-        hero_locale = self.heroes[hero_id]
-        return hero_vars, hero_locale
+    def get_hero(self, hero, text=None):
+        text = text or self.default
+        return text.heroes[text.hero_names[hero]]
 
-    def get_artifact_locale(self, artifact):
-        arti_id = self.artifact_names[artifact]
-        artifact_locale = self.artifacts[arti_id]
-        return artifact_locale
+    def get_artifact_locale(self, artifact, text=None):
+        text = text or self.default
+        return text.artifacts[text.artifact_names[artifact]]
 
     def get_unique(self, star, baseVal):
-        # fix level to 90
-        return math.floor((math.floor((star * 98677)/1000) * baseVal)/1000)
-
-    def fuzzysearch(self, hero, names):
-        extracted = process.extract(
-            hero, names.keys(), limit=1, scorer=fuzz.QRatio)
-        if extracted:
-            return extracted[0]
+        # fix level to 90, the data packs keep it for every hero and star
+        return unique(star, baseVal)
+
+    def cached_embed(self, text, id_, func, name, stars=None):
+        # embeds only depend on these, and nothing changes them after they are built
+        key = (text.name, id_, func.__name__, stars)
+        embed = self.embeds.get(key)
+        if embed is not None:
+            self.embeds.move_to_end(key)
+            return embed
+        embed = func(name, text=text) if stars is None else func(name, stars, text=text)
+        self.embeds[key] = embed
+        if len(self.embeds) > self.EMBED_CACHE_SIZE:
+            self.embeds.popitem(last=False)
+        return embed
+
+    def fuzzysearch(self, query, index):
+        return index.search(query)
+
+    def split_stars(self, text):
+        # "<name> <stars>", stars are 0 unless given and between 0 and 5
+        temp = text.rsplit(" ", 1)
+        if len(temp) == 2 and str.isdigit(temp[1]):
+            stars = int(temp[1])
+            text = temp[0]
         else:
-            return None
-
-    def load_files(self):
-        fullpath = os.path.dirname(os.path.abspath(__file__))
-        with open(os.path.join(fullpath, "Mask-of-Goblin/src/data.json")) as f:
-            data = json.load(f)
-        with open(os.path.join(fullpath, "Mask-of-Goblin/public/i18n/English/hero/names.json")) as f:
-            hero_names = json.load(f)
-        with open(os.path.join(fullpath, "Mask-of-Goblin/public/i18n/English/artifact/names.json")) as f:
-            artifact_names = json.load(f)
-        heroes = {}
-        for k, v in hero_names.items():
-            with open(os.path.join(fullpath, "Mask-of-Goblin/public/i18n/English/hero/" + str(v) + ".json")) as f:
-                hero = json.load(f)
-            heroes[str(v)] = hero
-        artifacts = {}
-        for k, v in artifact_names.items():
-            with open(os.path.join(fullpath, "Mask-of-Goblin/public/i18n/English/artifact/" + str(v) + ".json")) as f:
-                artifact = json.load(f)
-            artifacts[str(v)] = artifact
-        return data, hero_names, heroes, artifact_names, artifacts
+            stars = 0
+        if stars < 0 or stars > 5:
+            stars = 0
+        return text, stars
+
+    async def load_aliases(self):
+        if self.aliases is None:
+            self.aliases = await self.config.aliases()
+            self.update_aliases()
+
+    def alias_ids(self):
+        # aliases are saved with the default locale's names, every locale shares their ids
+        ids = {}
+        for kind, aliases in (self.aliases or {}).items():
+            names = self.default.names(kind)
+            ids[kind] = {alias: str(names[name]) for alias, name in aliases.items() if name in names}
+        return ids
+
+    def update_aliases(self):
+        ids = self.alias_ids()
+        for text in self.locales.values():
+            text.set_aliases(ids)
+
+    def load_files(self, fullpath=None, folder=None):
+        if fullpath is None:
+            fullpath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "Mask-of-Goblin")
+        if folder is None:
+            folder = str(cog_data_path(self))
+        if self.pack is not None:
+            self.pack.close()
+        for text in self.locales.values():
+            text.close()
+        self.templates.clear()
+        self.embeds.clear()
+        self.source = fullpath
+        self.folder = folder
+        self.pack = DataPack(fullpath, os.path.join(folder, "goblin.pack"))
+        self.data = self.pack.load()
+        self.uniques = UniqueTable(self.pack)
+        # other locales are loaded when a server first asks for them
+        self.default = self.load_locale(self.DEFAULT_LOCALE, {}, self.data)
+        self.locales = OrderedDict([(self.DEFAULT_LOCALE, self.default)])
@@ -0,0 +1,91 @@
+from collections import Counter, OrderedDict
+import re
+import unicodedata
+
+from fuzzywuzzy import fuzz
+
+NOT_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(name):
+    # "Kaulah's", "kaulahs" and "KAULAH S" all end up the same
+    name = unicodedata.normalize("NFKD", name)
+    name = "".join(c for c in name if not unicodedata.combining(c)).lower().replace("'", "")
+    return NOT_WORD.sub(" ", name).strip()
+
+
+def grams(name):
+    padded = "  " + name + " "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex:
+    """
+    Resolves what people type to hero or artifact names.
+
+    Exact matches of a name, its words run together or an alias are a dict
+    hit. Anything else is only scored against the names sharing the most
+    character trigrams with it, and answers are kept for repeated queries.
+    """
+
+    SHORTLIST = 8
+    CACHE_SIZE = 1024
+
+    def __init__(self, names, aliases=None):
+        self.names = list(names)
+        self.normalized = [normalize(name) for name in self.names]
+        self.exact = {normalized: i for i, normalized in enumerate(self.normalized)}
+        self.grams = {}
+        made_up = {}
+        for i, normalized in enumerate(self.normalized):
+            parts = normalized.split()
+            keys = {"".join(parts)}
+            if len(parts) > 1:
+                # initials and single words, "ror" or "rage" for "Ring of Rage"
+                keys.add("".join(part[0] for part in parts))
+                keys.update(part for part in parts if len(part) > 3)
+            for key in keys:
+                made_up.setdefault(key, set()).add(i)
+            for gram in grams(normalized):
+                self.grams.setdefault(gram, []).append(i)
+        for key, matches in made_up.items():
+            # only keys that point at one name, and never over a real name
+            if len(matches) == 1 and key not in self.exact:
+                self.exact[key] = matches.pop()
+        for alias, name in (aliases or {}).items():
+            if name in self.names:
+                key = normalize(alias)
+                self.exact[key] = self.names.index(name)
+                self.exact[key.replace(" ", "")] = self.exact[key]
+        self.cache = OrderedDict()
+
+    def search(self, query):
+        """
+        The (name, score out of 100) closest to `query`, None without names.
+        """
+        try:
+            self.cache.move_to_end(query)
+            return self.cache[query]
+        except KeyError:
+            pass
+        result = self.resolve(query)
+        self.cache[query] = result
+        if len(self.cache) > self.CACHE_SIZE:
+            self.cache.popitem(last=False)
+        return result
+
+    def resolve(self, query):
+        normalized = normalize(query)
+        for key in (normalized, normalized.replace(" ", "")):
+            if key in self.exact:
+                return self.names[self.exact[key]], 100
+        shared = Counter()
+        for gram in grams(normalized):
+            shared.update(self.grams.get(gram, ()))
+        candidates = [i for i, _ in shared.most_common(self.SHORTLIST)] or range(len(self.names))
+        best = None
+        for i in candidates:
+            score = fuzz.QRatio(normalized, self.normalized[i])
+            if best is None or score > best[1]:
+                best = (self.names[i], score)
+        return best
@@ -0,0 +1,113 @@
+import sys
+
+
+def text(value):
+    # the same names and sentences come up in every hero, keep one copy of each
+    return sys.intern(value) if type(value) is str else value
+
+
+def values(value):
+    return None if value is None else tuple(text(v) for v in value)
+
+
+def texts(value):
+    return tuple(text(v) for v in value)
+
+
+def part(build, *args):
+    # a part missing from the data is None, so only the commands showing it
+    # are affected and the rest of the record still builds
+    try:
+        return build(*args)
+    except (KeyError, IndexError, TypeError):
+        return None
+
+
+class Book:
+    __slots__ = ("text", "values")
+
+    def __init__(self, text_, values_):
+        self.text = text(text_)
+        self.values = values(values_)
+
+
+class Transcend:
+    """
+    The light and dark choice of a skill or of T5.
+    """
+
+    __slots__ = ("light", "light_values", "dark", "dark_values")
+
+    def __init__(self, locale, stats):
+        self.light = text(locale["light"])
+        self.light_values = values(stats["light"])
+        self.dark = text(locale["dark"])
+        self.dark_values = values(stats["dark"])
+
+
+class Skill:
+    __slots__ = ("name", "description", "values", "mana", "cooldown", "books", "transcend",
+                 "linked", "ut_name", "ut")
+
+    def __init__(self, locale, stats):
+        self.name = text(locale["name"])
+        self.description = text(locale["description"])
+        self.values = values(stats["description"])
+        self.mana = stats.get("mana")
+        self.cooldown = stats.get("cooldown")
+        self.books = part(lambda: tuple(Book(locale["books"][str(i)], stats["books"][i])
+                                        for i in range(3)))
+        self.transcend = part(Transcend, locale, stats)
+        # linked skills are (name, description, values)
+        self.linked = part(lambda: tuple((text(locale["linked"][str(i)]["name"]),
+                                          text(locale["linked"][str(i)]["description"]), values(linked))
+                                         for i, linked in enumerate(stats.get("linked", ()))))
+        ut = locale.get("ut") or {}
+        self.ut_name = text(ut.get("name", ""))
+        self.ut = part(texts, ut.get("description"))
+
+
+class Hero:
+    """
+    One hero's numbers from data.json with its text in one locale, parts
+    missing from either are None or empty.
+    """
+
+    __slots__ = ("id", "index", "name", "subtitle", "description", "story", "like", "dislike",
+                 "cls", "type", "range_type", "range", "position", "weight", "mpatk", "mpsec",
+                 "skills", "t5", "uw_name", "uw")
+
+    def __init__(self, id_, stats, locale):
+        self.id = text(id_)
+        self.index = stats["index"]
+        self.name = text(locale["name"])
+        self.subtitle = text(locale.get("subtitle", ""))
+        self.description = text(locale.get("description", ""))
+        self.story = locale.get("story", "")
+        self.like = text(locale.get("like", ""))
+        self.dislike = text(locale.get("dislike", ""))
+        auto = stats.get("auto") or {}
+        position = stats.get("position") or {}
+        self.cls = text(stats.get("class", ""))
+        self.type = text(stats.get("type", ""))
+        self.range_type = text(auto.get("rangeType", ""))
+        self.range = auto.get("range")
+        self.position = text(position.get("type", ""))
+        self.weight = position.get("weight")
+        self.mpatk = stats.get("mpatk")
+        self.mpsec = stats.get("mpsec")
+        self.skills = part(lambda: tuple(Skill(locale["s" + str(i)], stats["s" + str(i)])
+                                         for i in range(1, 5)))
+        self.t5 = part(Transcend, locale.get("t5"), stats.get("t5"))
+        uw = locale.get("uw") or {}
+        self.uw_name = text(uw.get("name", ""))
+        self.uw = part(texts, uw.get("description"))
+
+
+class Artifact:
+    __slots__ = ("id", "name", "description")
+
+    def __init__(self, id_, locale):
+        self.id = text(id_)
+        self.name = text(locale["name"])
+        self.description = texts(locale["description"])
@@ -0,0 +1,43 @@
+import time
+
+from .names import NameIndex
+from .records import Artifact, Hero
+
+
+class LocaleText:
+    """
+    Hero and artifact text of one Mask-of-Goblin locale.
+
+    Entries are decoded from the locale's pack into records the first time
+    they are used, heroes together with their numbers from `stats`, and a name
+    index is only built once something of that kind is searched.
+    """
+
+    def __init__(self, name, pack, aliases, stats, previous=None):
+        self.name = name
+        self.pack = pack
+        records = {"hero": lambda id_, locale: Hero(id_, stats[id_], locale), "artifact": Artifact}
+        self.hero_names, self.heroes, self.artifact_names, self.artifacts = pack.load(previous, records)
+        # kind -> {alias: id}, ids so the same aliases work in every locale
+        self.aliases = aliases
+        self.indexes = {}
+        self.used = time.monotonic()
+
+    def names(self, kind):
+        return self.hero_names if kind == "hero" else self.artifact_names
+
+    def index(self, kind):
+        index = self.indexes.get(kind)
+        if index is None:
+            names = {str(id_): name for name, id_ in self.names(kind).items()}
+            aliases = {alias: names[id_] for alias, id_ in self.aliases.get(kind, {}).items()
+                       if id_ in names}
+            index = self.indexes[kind] = NameIndex(self.names(kind), aliases)
+        return index
+
+    def set_aliases(self, aliases):
+        self.aliases = aliases
+        self.indexes = {}
+
+    def close(self):
+        self.pack.close()
@@ -0,0 +1,85 @@
+import numpy as np
+
+# get_unique gives 0 for 0 stars, so only starred levels get a column
+STARS = (1, 2, 3, 4, 5)
+ITEMS = ("uw", "s1", "s2", "s3", "s4")
+
+
+def base_stats(entry):
+    """
+    The "stats" of a unique weapon or treasure entry in data.json, {} when
+    it has none. Only {"stats": {stat: base value}} is read, other layouts
+    show no table.
+    """
+    stats = entry.get("stats") if isinstance(entry, dict) else None
+    if not isinstance(stats, dict):
+        return {}
+    return {stat: value for stat, value in stats.items() if type(value) in (int, float)}
+
+
+def unique(star, base):
+    # fix level to 90, numpy arrays give every star and stat at once
+    return np.floor(np.floor((star * 98677)/1000) * base/1000)
+
+
+def compute(heroes):
+    """
+    hero id -> item -> [[stat, [value at 1 to 5 stars]]] of the unique weapon
+    ("uw") and treasures ("s1" to "s4") of every hero in data.json.
+    """
+    rows = []
+    bases = []
+    entries = 0
+    for hero_id, hero in heroes.items():
+        for item in ITEMS:
+            entry = hero.get("uw") if item == "uw" else (hero.get(item) or {}).get("ut")
+            entries += entry is not None
+            for stat, base in base_stats(entry).items():
+                rows.append((str(hero_id), item, stat))
+                bases.append(base)
+    if entries and not rows:
+        print("No unique weapon or treasure stats found in data.json, %uw and %ut show no tables")
+    values = unique(np.array(STARS)[np.newaxis, :], np.array(bases, dtype=np.float64)[:, np.newaxis])
+    table = {}
+    for (hero_id, item, stat), row in zip(rows, values.astype(np.int64).tolist()):
+        table.setdefault(hero_id, {}).setdefault(item, []).append([stat, row])
+    return table
+
+
+class UniqueTable:
+    """
+    The stats `compute` stored in a data pack, read the first time a
+    unique weapon or treasure is shown.
+    """
+
+    def __init__(self, pack):
+        self.pack = pack
+        self.items = None
+        # (hero id, item) -> text of the ones shown so far
+        self.tables = {}
+
+    def stats(self, hero_id, item):
+        """
+        [[stat, [value at 1 to 5 stars]]] of one item, [] when it has no stats.
+        """
+        if self.items is None:
+            self.items = self.pack.decode("data/uniques")
+        return self.items.get(str(hero_id), {}).get(item, [])
+
+    def table(self, hero_id, item):
+        """
+        The stats of one item as text, a row per stat and a column per star
+        level, None when it has no stats.
+        """
+        key = (str(hero_id), item)
+        if key not in self.tables:
+            stats = self.stats(hero_id, item)
+            if not stats:
+                return None
+            rows = [["Stat"] + [str(star) + "*" for star in STARS]]
+            rows += [[stat] + [str(value) for value in values] for stat, values in stats]
+            widths = [max(len(row[i]) for row in rows) for i in range(len(rows[0]))]
+            self.tables[key] = "\n".join(" ".join(cell.ljust(width) if i == 0 else cell.rjust(width)
+                                                  for i, (cell, width) in enumerate(zip(row, widths)))
+                                         for row in rows)
+        return self.tables[key]
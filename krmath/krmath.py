@@ -1,22 +1,32 @@
 import asyncio
 import concurrent.futures
+import math
 from typing import Any
 import re
 import time
-import math
 
 from beautifultable import BeautifulTable
-from py_expression_eval import Parser
 import discord
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
 
+from .optimizer import BuildOptimizer
+from .sandbox import Sandbox, SandboxBusy
+from .softcap import SoftcapEngine
+
 
 Cog: Any = getattr(commands, "Cog", object)
 
 
+NUMBER = r"-?\d+(?:\.\d+)?"
+
+
 class KRMath(Cog):
-    parser = Parser()
+    MAX_SWEEP = 40
+    MAX_POINTS = 100000
+    OPTIMIZE_BUDGET = 2.0
+    SWEEP = re.compile(r"^(?P<expr>.+?)\s+for\s+(?P<variable>[A-Za-z_]\w*)\s*=\s*(?P<start>{0})\s*\.\.\s*"
+                       r"(?P<stop>{0})(?:\s+step\s+(?P<step>{0}))?\s*$".format(NUMBER), re.IGNORECASE)
     softcaps = {
         "crit": {
             "MaxK": 2000,
@@ -180,8 +190,42 @@ class KRMath(Cog):
         }
     }
 
+    engine = SoftcapEngine(softcaps)
+    stat_names = {
+        "crit": "Crit",
+        "acc": "Accuracy",
+        "dodge": "Dodge, Block, Lifesteal",
+        "critresist": "Crit Resist",
+        "pen": "Penetration, Tough",
+        "ccacc": "CC ACC",
+        "ccresist": "CC Resist",
+        "aspd": "Attack speed",
+        "blockdef": "Block DEF",
+        "mpatk": "Mp/Atk"
+    }
+    stat_aliases = {
+        "accuracy": "acc",
+        "block": "dodge",
+        "lifesteal": "dodge",
+        "penetration": "pen",
+        "tough": "pen",
+        "cc": "ccacc",
+        "speed": "aspd",
+        "attackspeed": "aspd",
+        "mp": "mpatk"
+    }
+
     def __init__(self, bot: Red):
         self.bot = bot
+        self.sandbox = Sandbox()
+        self.optimizer = BuildOptimizer(self.engine)
+        self.optimizer_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+
+    def cog_unload(self):
+        self.sandbox.close()
+        self.optimizer_pool.shutdown(wait=False)
+
+    __unload = cog_unload
 
     @commands.command(name="calc")
     async def calc(self, ctx: commands.Context, *, expr):
@@ -191,10 +235,18 @@ class KRMath(Cog):
         for a full list of what you can do.
         Will result in an error if an invalid expression or
         an expensive computation is performed.
+        Add `for x=1000..3000 step 100` to work it out over a range of x.
         """
+        expr = expr.replace("`", "")
+        sweep = self.SWEEP.match(expr)
         try:
-            result = await asyncio.wait_for(self.a_parse(expr.replace("`", "")), timeout=1)
-            await ctx.send(result)
+            if sweep is None:
+                result = await self.a_parse(expr)
+                await ctx.send(result)
+            else:
+                await self.calc_sweep(ctx, sweep)
+        except SandboxBusy:
+            await ctx.send("Too many calculations right now, try again in a moment.")
         except:
             await ctx.send("Calculation error.")
 
@@ -205,14 +257,91 @@ class KRMath(Cog):
         """
         await ctx.send(self.sc_table(int(val)))
 
-    async def a_parse(self, expr):
+    @commands.command(name="needstat")
+    async def needstat(self, ctx: commands.Context, stat, percent):
+        """
+        Raw stat needed for a capped value `%needstat crit 80`,
+        stats are the ones listed by %softcap.
+        """
+        key = stat.lower().replace(" ", "").replace("_", "")
+        key = self.stat_aliases.get(key, key)
+        if key not in self.softcaps:
+            await ctx.send("Unknown stat, try one of: " + ", ".join(self.softcaps))
+            return
+        try:
+            target = float(percent.rstrip("%"))
+        except ValueError:
+            await ctx.send("Percentage must be a number.")
+            return
+        if not 0 <= target < 1000:
+            await ctx.send("Percentage must be between 0 and 1000.")
+            return
+
+        name = self.stat_names[key]
+        raw = self.engine.required(key, target)
+        if raw is None:
+            await ctx.send("{} caps at {}%, {}% is not reachable.".format(
+                name, self.softcaps[key]["MaxK"] / 10, target))
+            return
+        await ctx.send("{} {} gives {}%.".format(raw, name, self.actualStat(key, raw)))
+
+    @commands.command(name="optimize")
+    async def optimize(self, ctx: commands.Context, points: int, crit: int = 0, pen: int = 0, aspd: int = 0):
+        """
+        Best splits of stat points between crit, pen and attack speed
+        `%optimize 3000`, add the crit, pen and aspd you already have
+        to build on them `%optimize 3000 500 200 0`.
+        """
+        if not 0 < points <= self.MAX_POINTS or min(crit, pen, aspd) < 0:
+            await ctx.send("Points must be between 1 and {}, and stats can't be negative.".format(
+                self.MAX_POINTS))
+            return
+        base = (crit, pen, aspd)
         loop = asyncio.get_running_loop()
-        with concurrent.futures.ThreadPoolExecutor() as pool:
-            result = await loop.run_in_executor(pool, self.parse, expr)
-        return result
+        builds, complete = await loop.run_in_executor(
+            self.optimizer_pool, self.optimizer.search, points, base, 5, self.OPTIMIZE_BUDGET)
 
-    def parse(self, expr):
-        return self.parser.parse(expr).evaluate({})
+        table = BeautifulTable()
+        table.column_headers = ["Crit", "Pen", "Aspd", "Damage"]
+        table.set_style(BeautifulTable.STYLE_COMPACT)
+        for damage, *split in builds:
+            row = ["+{} ({}%)".format(extra, self.actualStat(stat, raw + extra))
+                   for stat, raw, extra in zip(BuildOptimizer.STATS, base, split)]
+            table.append_row(row + ["x{:.3f}".format(damage)])
+        note = "" if complete else "Ran out of time, these are the best found so far.\n"
+        await ctx.send(note + "```\n" + str(table) + "\n```")
+
+    async def a_parse(self, expr):
+        return await self.sandbox.evaluate(expr)
+
+    async def calc_sweep(self, ctx, sweep):
+        values = self.sweep_values(sweep["start"], sweep["stop"], sweep["step"] or "1")
+        if values is None:
+            await ctx.send("Sweeps need a step going from start to stop in at most {} values.".format(
+                self.MAX_SWEEP))
+            return
+        results = await self.sandbox.evaluate(sweep["expr"], sweep["variable"], values)
+
+        table = BeautifulTable()
+        table.column_headers = [sweep["variable"], sweep["expr"][:40]]
+        table.column_alignments[sweep["variable"]] = BeautifulTable.ALIGN_RIGHT
+        table.set_style(BeautifulTable.STYLE_COMPACT)
+        for value, result in zip(values, results):
+            table.append_row([str(value), "error" if result is None else str(result)])
+        await ctx.send("```\n" + str(table) + "\n```")
+
+    def sweep_values(self, start, stop, step):
+        # whole numbers stay ints so expressions like x%7 work as expected
+        number = int if all(re.fullmatch(r"-?\d+", n) for n in (start, stop, step)) else float
+        start, stop, step = number(start), number(stop), number(step)
+        if step == 0:
+            return None
+        count = math.floor((stop - start) / step + 1e-9) + 1
+        if not 0 < count <= self.MAX_SWEEP:
+            return None
+        if number is int:
+            return [start + i * step for i in range(count)]
+        return [round(start + i * step, 10) for i in range(count)]
 
     def sc_table(self, val):
         table = BeautifulTable()
@@ -222,59 +351,13 @@ class KRMath(Cog):
         table.column_alignments['Capped Value'] = BeautifulTable.ALIGN_RIGHT
         table.set_style(BeautifulTable.STYLE_BOX)
 
-        table.append_row(["Crit", str(self.softcaps["crit"]["X2"]),
-                          self.actualStat(self.softcaps["crit"], val)])
-        table.append_row(["Accuracy", str(self.softcaps["acc"]["X2"]), self.actualStat(
-            self.softcaps["acc"], val)])
-        table.append_row(["Dodge, Block, Lifesteal", str(self.softcaps["dodge"]["X2"]), self.actualStat(
-            self.softcaps["dodge"], val)])
-        table.append_row(["Crit Resist", str(self.softcaps["critresist"]["X2"]), self.actualStat(
-            self.softcaps["critresist"], val)])
-        table.append_row(["Penetration, Tough", str(self.softcaps["pen"]["X2"]), self.actualStat(
-            self.softcaps["pen"], val)])
-        table.append_row(["CC ACC", "No Softcap", self.actualStat(
-            self.softcaps["ccacc"], val)])
-        table.append_row(["CC Resist", "No Softcap", self.actualStat(
-            self.softcaps["ccresist"], val)])
-        table.append_row(["Attack speed", str(self.softcaps["aspd"]["X2"]), self.actualStat(
-            self.softcaps["aspd"], val)])
-        table.append_row(["Block DEF", str(self.softcaps["blockdef"]["X2"]), self.actualStat(
-            self.softcaps["blockdef"], val)])
-        table.append_row(["Mp/Atk", str(self.softcaps["mpatk"]["X2"]),
-                          self.actualStat(self.softcaps["mpatk"], val)])
+        capped = self.engine.table(val)
+        for stat, name in self.stat_names.items():
+            softcap = "No Softcap" if stat in ("ccacc", "ccresist") else str(self.softcaps[stat]["X2"])
+            table.append_row([name, softcap, str(capped[stat]) + "%"])
 
         return "```\n" + str(table) + "\n```"
 
-    def actualStat(self, statType, istat):
-        actual = 0
-        # variable names are fucked cause vespa
-        if istat == 0:
-            actual = 0
-        # 2nd upper softcap
-        elif istat > statType["X1"]:
-            actual = self.attenuateInv(
-                istat, statType["MaxK"], statType["A1"], statType["B1"])
-        # 1st upper softcap
-        elif istat > statType["X2"]:
-            actual = math.floor(
-                (istat * statType["A2"]) / 1000) + statType["B2"]
-        # 2nd lower softcap
-        elif istat < statType["X3"]:
-            actual = self.attenuateInv(
-                istat, statType["MinK"], statType["A3"], statType["B3"])
-        # 1st lower softcap
-        elif istat < statType["X4"]:
-            actual = self.attenuate(
-                istat, statType["MinK"], statType["A4"], statType["B4"])
-        # uncapped
-        else:
-            actual = istat
-        # return to 1 significant decimal place
-        actual = round(actual) / 10
-        return str(round(actual, 1)) + "%"
-
-    def attenuate(self, x, k, a, b):
-        return math.floor((k * 1000000) / (a * x * x + b * x + 1000000))
-
-    def attenuateInv(self, x, k, a, b):
-        return k - math.floor((k * 1000000) / (a * x * x + b * x + 1000000))
+    def actualStat(self, stat, istat):
+        # percentage with 1 decimal place, istat can be an int or an array of them
+        return self.engine.percent(stat, istat)
@@ -0,0 +1,115 @@
+import heapq
+import time
+
+import numpy as np
+
+
+class BuildOptimizer:
+    """
+    Best ways to split stat points between crit, pen and attack speed.
+
+    Damage is measured with a simple model, relative to hitting with none of
+    the three stats:
+
+        crit    1 + chance * (CRIT_DAMAGE - 1), chance capped at 100%
+        pen     1 - DEFENSE * (1 - pen), the share of damage the target's
+                DEF takes away, minus what penetration ignores
+        aspd    1 + attack speed, more attacks in the same time
+
+    and the three are multiplied together. Every stat only ever helps, so all
+    points are always spent and a stat never gets more than it needs to max
+    out its curve, which is all the pruning the search needs.
+    """
+
+    CRIT_DAMAGE = 2.0
+    DEFENSE = 0.5
+    STATS = ("crit", "pen", "aspd")
+    GRID = 400
+    CHUNK = 64
+
+    def __init__(self, engine):
+        self.engine = engine
+
+    def multiplier(self, stat, raw):
+        value = np.asarray(self.engine.permille(stat, raw), dtype=np.float64) / 1000
+        if stat == "crit":
+            return 1 + np.minimum(value, 1) * (self.CRIT_DAMAGE - 1)
+        if stat == "pen":
+            return 1 - self.DEFENSE * (1 - np.minimum(value, 1))
+        return 1 + value
+
+    def useful(self, stat, base, points):
+        # points past the top of the curve are wasted
+        curve = self.engine.curves[stat]
+        top = 1000 if stat == "crit" else curve.params["MaxK"]
+        needed = curve.required(top)
+        if needed is None:
+            return points
+        return max(0, min(points, needed - base))
+
+    def search(self, points, base=(0, 0, 0), top=5, budget=1.0):
+        """
+        The `top` best (damage, crit, pen, aspd points) splits, best first, and
+        whether the whole search fit in `budget` seconds.
+        """
+        deadline = time.perf_counter() + budget
+        step = max(1, points // self.GRID)
+        best = []
+        complete = self.scan(points, base, step, 0, points, 0, points, best, top, deadline)
+        if step > 1 and complete:
+            # go over every point around the best coarse splits
+            for _, crit, pen, _ in sorted(best, reverse=True):
+                if not self.scan(points, base, 1, crit - step, crit + step, pen - step, pen + step,
+                                 best, top, deadline):
+                    complete = False
+                    break
+        found = {}
+        for damage, crit, pen, aspd in best:
+            found[(crit, pen, aspd)] = damage
+        ranked = sorted(((damage,) + split for split, damage in found.items()), reverse=True)
+        return [(damage / self.baseline(base), crit, pen, aspd)
+                for damage, crit, pen, aspd in ranked[:top]], complete
+
+    def baseline(self, base):
+        damage = 1.0
+        for stat, raw in zip(self.STATS, base):
+            damage *= float(self.multiplier(stat, raw))
+        return damage
+
+    def scan(self, points, base, step, crit_low, crit_high, pen_low, pen_high, best, top, deadline):
+        crit_high = min(crit_high, self.useful("crit", base[0], points))
+        pen_high = min(pen_high, self.useful("pen", base[1], points))
+        crits = np.arange(max(0, crit_low), crit_high + 1, step, dtype=np.int64)
+        pens = np.arange(max(0, pen_low), pen_high + 1, step, dtype=np.int64)
+        if crit_high not in crits:
+            crits = np.append(crits, crit_high)
+        if pen_high not in pens:
+            pens = np.append(pens, pen_high)
+
+        crit_damage = self.multiplier("crit", base[0] + crits)
+        pen_damage = self.multiplier("pen", base[1] + pens)
+        speeds = points - crits[:, None] - pens[None, :]
+        aspd = np.unique(speeds[speeds >= 0])
+        aspd_damage = np.full(points + 1, -np.inf)
+        aspd_damage[aspd] = self.multiplier("aspd", base[2] + aspd)
+
+        for start in range(0, len(crits), self.CHUNK):
+            if time.perf_counter() > deadline:
+                return False
+            rows = slice(start, start + self.CHUNK)
+            left = speeds[rows]
+            damage = crit_damage[rows, None] * pen_damage[None, :] * aspd_damage[np.maximum(left, 0)]
+            damage[left < 0] = -np.inf
+            flat = damage.ravel()
+            count = min(top, flat.size)
+            for index in np.argpartition(flat, -count)[-count:]:
+                if flat[index] == -np.inf:
+                    continue
+                row, column = divmod(int(index), len(pens))
+                entry = (float(flat[index]), int(crits[start + row]), int(pens[column]),
+                         int(left[row, column]))
+                if len(best) < top * 4:
+                    heapq.heappush(best, entry)
+                else:
+                    heapq.heappushpop(best, entry)
+        return True
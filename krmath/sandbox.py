@@ -0,0 +1,251 @@
+import asyncio
+from collections import OrderedDict
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import re
+import sys
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+OPERATOR_SPACE = re.compile(r"\s*([-+*/^%(),])\s*")
+WHITESPACE = re.compile(r"\s+")
+QUOTES = "'\""
+
+
+class SandboxBusy(Exception):
+    pass
+
+
+def split_literals(expr):
+    """
+    `expr` cut into code and string literal parts, literals at odd indices,
+    ending strings where the parser does.
+    """
+    parts = []
+    code = pos = 0
+    while pos < len(expr):
+        quote = expr[pos]
+        if quote not in QUOTES:
+            pos += 1
+            continue
+        end = pos + 1
+        # a quote right after a backslash inside the literal does not end it
+        while end < len(expr) and (expr[end] != quote or end - 1 > pos and expr[end - 1] == "\\"):
+            end += 1
+        parts += [expr[code:pos], expr[pos:end + 1]]
+        code = pos = end + 1
+    parts.append(expr[code:])
+    return parts
+
+
+def normalize(expr):
+    # whitespace never changes what an expression means around operators,
+    # but it is part of the text of string literals
+    return "".join(part if i % 2 else OPERATOR_SPACE.sub(r"\1", WHITESPACE.sub(" ", part))
+                   for i, part in enumerate(split_literals(expr.strip())))
+
+
+class Expressions:
+    """
+    Parsed expressions, keeping the most recently used ones.
+    """
+
+    def __init__(self, size=256):
+        from py_expression_eval import Parser
+        self.parser = Parser()
+        self.size = size
+        self.parsed = OrderedDict()
+
+    def get(self, expr):
+        key = normalize(expr)
+        parsed = self.parsed.get(key)
+        if parsed is None:
+            parsed = self.parser.parse(key)
+            self.parsed[key] = parsed
+            if len(self.parsed) > self.size:
+                self.parsed.popitem(last=False)
+        else:
+            self.parsed.move_to_end(key)
+        return parsed
+
+    def evaluate(self, expr, variable=None, values=None):
+        parsed = self.get(expr)
+        if variable is None:
+            return parsed.evaluate({})
+        # one result per value, None where that value fails
+        results = []
+        error = None
+        for value in values:
+            try:
+                results.append(parsed.evaluate({variable: value}))
+            except Exception as e:
+                results.append(None)
+                error = e
+        if error is not None and all(result is None for result in results):
+            raise error
+        return results
+
+
+def address_space():
+    # bytes mapped by this process, None where /proc cannot tell
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[0]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def serve(conn, memory):
+    """
+    Worker loop, evaluates one expression at a time until the pipe closes.
+    """
+    expressions = Expressions()
+    if resource is not None:
+        # `memory` on top of what importing everything took, which depends on
+        # the bot's install and the machine more than on the expressions
+        limit = memory + (address_space() or 0)
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    conn.send(True)
+    while True:
+        try:
+            expr, variable, values, seconds = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if resource is not None:
+            # the limit counts all cpu time used so far, SIGXCPU kills the worker
+            usage = resource.getrusage(resource.RUSAGE_SELF)
+            used = math.ceil(usage.ru_utime + usage.ru_stime)
+            resource.setrlimit(resource.RLIMIT_CPU, (used + seconds, resource.RLIM_INFINITY))
+        try:
+            reply = (True, expressions.evaluate(expr, variable, values))
+        except MemoryError:
+            reply = (False, "out of memory")
+        except Exception as e:
+            reply = (False, str(e))
+        try:
+            conn.send(reply)
+        except (ValueError, OverflowError, MemoryError):
+            conn.send((False, "result too large"))
+
+
+class Worker:
+    STARTUP = 30
+
+    def __init__(self, context, memory):
+        self.context = context
+        self.memory = memory
+        self.process = None
+        self.conn = None
+
+    def start(self):
+        parent, child = self.context.Pipe()
+        # the child imports this module by name, so the folder the cog was
+        # loaded from has to be on its path
+        folder = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        added = folder not in sys.path
+        if added:
+            sys.path.insert(0, folder)
+        try:
+            process = self.context.Process(target=serve, args=(child, self.memory), daemon=True)
+            process.start()
+        finally:
+            if added:
+                sys.path.remove(folder)
+        child.close()
+        self.process = process
+        self.conn = parent
+        # wait for it to be ready, so the job timeout never includes starting up
+        if not parent.poll(self.STARTUP):
+            self.stop()
+            raise RuntimeError("calc worker did not start")
+        parent.recv()
+
+    def run(self, job, timeout):
+        if self.process is None or not self.process.is_alive():
+            self.stop()
+            self.start()
+        try:
+            self.conn.send(job + (math.ceil(timeout),))
+            if self.conn.poll(timeout):
+                return self.conn.recv()
+        except (EOFError, OSError):
+            pass
+        # out of time, or killed for going over its cpu limit
+        self.stop()
+        raise asyncio.TimeoutError()
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+class Sandbox:
+    """
+    Persistent worker processes for evaluating untrusted expressions.
+
+    Every worker has an address space limit and a cpu limit per job, and is
+    killed and started again when a job runs out of time. Jobs past the
+    queue limit are turned away straight away instead of waiting.
+    """
+
+    def __init__(self, workers=2, timeout=1, memory=256 * 1024 * 1024, queue=8):
+        context = multiprocessing.get_context("spawn")
+        self.workers = [Worker(context, memory) for _ in range(workers)]
+        self.timeout = timeout
+        self.limit = workers + queue
+        self.pending = 0
+        self.idle = None
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+
+    async def evaluate(self, expr, variable=None, values=None):
+        """
+        Value of `expr`, or a list of its values for each of `values` of
+        `variable` evaluated in one go, None where one fails.
+        """
+        if self.pending >= self.limit:
+            raise SandboxBusy()
+        if self.idle is None:
+            self.idle = asyncio.Queue()
+            for worker in self.workers:
+                self.idle.put_nowait(worker)
+        self.pending += 1
+        try:
+            worker = await self.idle.get()
+            loop = asyncio.get_running_loop()
+            reply = concurrent.futures.Future()
+            job = self.executor.submit(self.call, worker, (expr, variable, values), reply)
+            # the worker is only free again once its job is, even if the caller gave up
+            job.add_done_callback(lambda _: loop.call_soon_threadsafe(self.idle.put_nowait, worker))
+            ok, result = await asyncio.wrap_future(reply)
+        finally:
+            self.pending -= 1
+        if not ok:
+            raise ValueError(result)
+        return result
+
+    def call(self, worker, job, reply):
+        try:
+            reply.set_result(worker.run(job, self.timeout))
+        except BaseException as e:
+            reply.set_exception(e)
+        if worker.process is None:
+            # replace a killed worker before the next job has to wait for it
+            try:
+                worker.start()
+            except Exception:
+                pass
+
+    def close(self):
+        for worker in self.workers:
+            worker.stop()
+        self.executor.shutdown(wait=False)
@@ -0,0 +1,127 @@
+import math
+
+import numpy as np
+
+
+class Softcap:
+    """
+    One `KRMath.softcaps` entry compiled into a piecewise function of the raw
+    stat. Values are in tenths of a percent, exactly as the game rounds them.
+
+    Every integer in [low, high] is precomputed into a table, anything outside
+    of it is worked out with Python integers so huge stats stay exact.
+    """
+
+    def __init__(self, params, low=-5000, high=20000):
+        self.params = params
+        self.low = low
+        self.high = high
+        self.table = self.evaluate(np.arange(low, high + 1, dtype=np.int64))
+        self.table.setflags(write=False)
+        # best value reached by any raw stat from 0 up to each point, sorted so
+        # the raw stat needed for a value is a binary search away
+        self.reach = np.maximum.accumulate(self.table[-low:])
+
+    def evaluate(self, x):
+        # float64 holds every numerator and denominator exactly inside the table
+        # domain, so floor(a / b) matches Python's int / int division there
+        p = self.params
+        xf = x.astype(np.float64)
+        conditions = [x == 0, x > p["X1"], x > p["X2"], x < p["X3"], x < p["X4"]]
+        choices = [
+            np.zeros_like(xf),
+            p["MaxK"] - np.floor(p["MaxK"] * 1000000 / (p["A1"] * xf * xf + p["B1"] * xf + 1000000)),
+            np.floor(xf * p["A2"] / 1000) + p["B2"],
+            p["MinK"] - np.floor(p["MinK"] * 1000000 / (p["A3"] * xf * xf + p["B3"] * xf + 1000000)),
+            np.floor(p["MinK"] * 1000000 / (p["A4"] * xf * xf + p["B4"] * xf + 1000000)),
+        ]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.select(conditions, choices, default=xf).astype(np.int64)
+
+    def scalar(self, x):
+        # variable names are fucked cause vespa
+        p = self.params
+        if x == 0:
+            return 0
+        # 2nd upper softcap
+        elif x > p["X1"]:
+            return p["MaxK"] - math.floor((p["MaxK"] * 1000000) / (p["A1"] * x * x + p["B1"] * x + 1000000))
+        # 1st upper softcap
+        elif x > p["X2"]:
+            return math.floor((x * p["A2"]) / 1000) + p["B2"]
+        # 2nd lower softcap
+        elif x < p["X3"]:
+            return p["MinK"] - math.floor((p["MinK"] * 1000000) / (p["A3"] * x * x + p["B3"] * x + 1000000))
+        # 1st lower softcap
+        elif x < p["X4"]:
+            return math.floor((p["MinK"] * 1000000) / (p["A4"] * x * x + p["B4"] * x + 1000000))
+        # uncapped
+        return x
+
+    def permille(self, raw):
+        """
+        Capped values of an integer or an array of integers, in tenths of a percent.
+        """
+        if np.ndim(raw) == 0:
+            raw = int(raw)
+            if self.low <= raw <= self.high:
+                return int(self.table[raw - self.low])
+            return self.scalar(raw)
+        raw = np.asarray(raw, dtype=np.int64)
+        inside = (raw >= self.low) & (raw <= self.high)
+        values = self.table[np.where(inside, raw - self.low, 0)]
+        if not inside.all():
+            outside = ~inside
+            values[outside] = [self.scalar(int(x)) for x in raw[outside]]
+        return values
+
+    def percent(self, raw):
+        return np.asarray(self.permille(raw)) / 10
+
+    def required(self, target):
+        """
+        Smallest raw stat from 0 up that reaches `target` tenths of a percent,
+        None if the curve never gets there.
+        """
+        if target <= self.reach[-1]:
+            return int(np.searchsorted(self.reach, target))
+        # past the last softcap the curve climbs towards MaxK
+        if target > self.params["MaxK"]:
+            return None
+        low = self.high
+        high = self.high * 2
+        while self.scalar(high) < target:
+            low, high = high, high * 2
+        while high - low > 1:
+            middle = (low + high) // 2
+            if self.scalar(middle) >= target:
+                high = middle
+            else:
+                low = middle
+        return high
+
+
+class SoftcapEngine:
+    """
+    Every softcap curve, evaluated over whole arrays of raw stats at once.
+    """
+
+    def __init__(self, softcaps, low=-5000, high=20000):
+        self.curves = {stat: Softcap(params, low, high) for stat, params in softcaps.items()}
+
+    def permille(self, stat, raw):
+        return self.curves[stat].permille(raw)
+
+    def percent(self, stat, raw):
+        values = self.curves[stat].percent(raw)
+        return values if values.ndim else float(values)
+
+    def required(self, stat, percent):
+        # ask for the next tenth up, 80.01% is only met by 80.1%
+        return self.curves[stat].required(math.ceil(round(percent * 10, 6)))
+
+    def table(self, raw):
+        """
+        Capped percentage of one raw value for every stat.
+        """
+        return {stat: self.percent(stat, raw) for stat in self.curves}
@@ -1,42 +1,137 @@
 import asyncio
 import aiohttp
 import async_timeout
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import Any
 import re
 import html
+import random
+import sqlite3
+import time
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
 import parsedatetime
 import pytz
 from tzlocal import get_localzone
 import discord
 from redbot.core import Config, checks, commands
 from redbot.core.bot import Red
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box, pagify
+
+from .ledger import Ledger
+from .metrics import Metrics
+
+
+try:
+    import lxml
+    PARSER = "lxml"
+except ImportError:
+    PARSER = "html.parser"
 
 
 Cog: Any = getattr(commands, "Cog", object)
 
+# messages carry several embeds since discord.py 2.0
+MULTI_EMBED = discord.version_info >= (2, 0)
+
+# only the feed items are built into the tree, the rest of the page is skipped
+FEED_STRAINER = SoupStrainer(class_="frame_plug")
+POST_FIELDS = ("tit_feed", "txt_feed", "name", "thumb", "img")
+WHITESPACE = re.compile(r"\s+")
+
 
 class KRPlug(Cog):
-    URLS = ['https://www.plug.game/kingsraid/1030449/posts?menuId=1',   # Notices
-            'https://www.plug.game/kingsraid/1030449/posts?menuId=9',   # Patch Note
-            'https://www.plug.game/kingsraid/1030449/posts?menuId=32']  # Game Contents
+    BOARDS = {
+        "notices": {"game": "kingsraid/1030449", "menuId": 1, "label": "Notices"},
+        "patchnotes": {"game": "kingsraid/1030449", "menuId": 9, "label": "Patch Note"},
+        "contents": {"game": "kingsraid/1030449", "menuId": 32, "label": "Game Contents"}
+    }
+
+    SEND_CONCURRENCY = 10
+    EMBEDS_PER_MESSAGE = 10
+    EMBED_CHARACTERS = 6000
+    FOLLOW_INTERVAL = 5
+    LEDGER_AGE = 7 * 24 * 3600
+    MAX_FAILURES = 5
+    SEEN_WINDOW = 50
+    CACHE_TTL = 300
+    CACHE_SIZE = 100
+    MAX_BACKOFF = 900
+    BREAKER_THRESHOLD = 5
+    BREAKER_COOLDOWN = 1800
+    # posts seen in an hour of the week before it counts as an active window,
+    # over the last ACTIVITY_WEEKS weeks
+    ACTIVE_THRESHOLD = 3
+    ACTIVITY_WEEKS = 4
 
-    full_posts = []
+    calendar = parsedatetime.Calendar()
 
     def __init__(self, bot: Red):
         self.bot = bot
+        # one pooled session for the life of the cog, the keep-alive outlasts
+        # the polling interval so each cycle reuses the open connections
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(
+                limit_per_host=4, ttl_dns_cache=600, keepalive_timeout=90),
+            loop=self.bot.loop)
+        # ETag and Last-Modified of the last full response, per url
+        self.validators = {}
+        # article id -> (expiry, post, embed) of the newest parsed posts, filled by
+        # the announce cycle so commands never have to scrape on their own
+        self.cache = {}
+        self.refreshed = 0
+        self.refresh_lock = asyncio.Lock()
+        # guild id -> {channel id: subscribed board names, None for every board},
+        # reloaded once per announcement and kept current by the commands
+        self.subscriptions = {}
+        # board name -> [(guild id, channel id)] built from the subscriptions
+        self.routes = {}
+        # consecutive failed sends per channel id, pruned past MAX_FAILURES
+        self.failures = Counter()
+        self.metrics = Metrics()
+        self.send_slots = asyncio.Semaphore(self.SEND_CONCURRENCY)
+        # url -> next poll time and consecutive failures of that board
+        self.polls = {}
+        # board name -> board, and the board url -> board name
+        self.registry = {}
+        self.urls = {}
+        self.set_registry(self.BOARDS)
+        self.interval = 60
+        self.active_interval = 20
+        self.catchup_pages = 5
+        # seconds new posts wait for more to share their messages, 0 sends at once
+        self.coalesce = 0
+        self.pending = []
+        self.flush_task = None
+        # shared with other bot processes when a ledger file is set
+        self.ledger = None
+        self.ledger_seq = 0
+        self.following = False
+        # week number -> hour of the week (UTC) -> posts announced in it
+        self.activity = {}
 
         self.config = Config.get_conf(
             self, identifier=107114112108117103, force_registration=True)
 
-        default_global = {"posts": []}
-        default_guild = {"channelid": None}
+        # posts is the pre-board history, only read to seed boards once
+        default_global = {"posts": [], "boards": {}, "interval": 60,
+                          "active_interval": 20, "activity": {}, "registry": self.BOARDS,
+                          "catchup_pages": 5, "coalesce": 0, "ledger": None}
+        # channelid gets every board, subscriptions maps channel ids to board names
+        default_guild = {"channelid": None, "subscriptions": {}}
 
         self.config.register_global(**default_global)
         self.config.register_guild(**default_guild)
 
+    def cog_unload(self):
+        self.bot.loop.create_task(self.session.close())
+        if self.ledger is not None:
+            self.ledger.close()
+
+    __unload = cog_unload
+
     @commands.command()
     @checks.mod_or_permissions(administrator=True)
     @commands.guild_only()
@@ -47,22 +142,197 @@ class KRPlug(Cog):
         """
         if channel is not None:
             await self.config.guild(ctx.guild).channelid.set(channel.id)
+            self.failures.pop(channel.id, None)
+            await self.load_guild(ctx.guild)
             await ctx.send("Announcement channel has been set to {}".format(channel.mention))
         else:
             await self.config.guild(ctx.guild).channelid.set(None)
+            await self.load_guild(ctx.guild)
             await ctx.send("Announcement channel has been cleared")
 
+    @commands.command()
+    @checks.mod_or_permissions(administrator=True)
+    @commands.guild_only()
+    async def subscribe(self, ctx: commands.Context, channel: discord.TextChannel, *boards: str):
+        """
+        Announce only some boards in a channel `%subscribe <#channel_name> <board> <board>`
+        See `%boards` for the board names
+        """
+        boards = [board.lower() for board in boards]
+        unknown = [board for board in boards if board not in self.registry]
+        if not boards or unknown:
+            await ctx.send("Unknown boards, pick from: {}".format(", ".join(self.registry)))
+            return
+        async with self.config.guild(ctx.guild).subscriptions() as subscriptions:
+            current = subscriptions.get(str(channel.id), [])
+            subscriptions[str(channel.id)] = sorted(set(current).union(boards))
+        self.failures.pop(channel.id, None)
+        await self.load_guild(ctx.guild)
+        await ctx.send("{} will announce {}".format(
+            channel.mention, ", ".join(self.guild_boards(ctx.guild.id, channel.id))))
+
+    @commands.command()
+    @checks.mod_or_permissions(administrator=True)
+    @commands.guild_only()
+    async def unsubscribe(self, ctx: commands.Context, channel: discord.TextChannel, *boards: str):
+        """
+        Stop announcing boards in a channel `%unsubscribe <#channel_name> <board>`
+        Leave the boards out to stop all of them `%unsubscribe <#channel_name>`
+        """
+        boards = {board.lower() for board in boards}
+        guild = self.config.guild(ctx.guild)
+        await self.load_guild(ctx.guild)
+        remaining = set(self.guild_boards(ctx.guild.id, channel.id)) - boards if boards else set()
+        # the announcement channel gets every board, so narrow it to a subscription
+        if await guild.channelid() == channel.id:
+            await guild.channelid.set(None)
+        async with guild.subscriptions() as subscriptions:
+            if remaining:
+                subscriptions[str(channel.id)] = sorted(remaining)
+            else:
+                subscriptions.pop(str(channel.id), None)
+        await self.load_guild(ctx.guild)
+        if remaining:
+            await ctx.send("{} will announce {}".format(channel.mention, ", ".join(sorted(remaining))))
+        else:
+            await ctx.send("{} will not announce anything".format(channel.mention))
+
+    @commands.command()
+    @commands.guild_only()
+    async def boards(self, ctx: commands.Context):
+        """
+        Lists the boards and where they are announced in this server `%boards`
+        """
+        lines = []
+        for name, board in self.registry.items():
+            channels = [self.bot.get_channel(channel_id) for guild_id, channel_id
+                        in self.routes.get(name, ()) if guild_id == ctx.guild.id]
+            lines.append("{} ({}): {}".format(name, board["label"], ", ".join(
+                channel.mention for channel in channels if channel is not None) or "-"))
+        await ctx.send("\n".join(lines))
+
+    @commands.command()
+    @commands.is_owner()
+    async def addboard(self, ctx: commands.Context, name: str, game: str, menu_id: int, *, label: str):
+        """
+        Add a plug.game board to check `%addboard <name> <game> <menuId> <label>`
+        e.g. `%addboard events kingsraid/1030449 2 Events`
+        """
+        name = name.lower()
+        async with self.config.registry() as registry:
+            registry[name] = {"game": game.strip("/"), "menuId": menu_id, "label": label}
+            self.set_registry(dict(registry))
+        await ctx.send("Board {} added, {}".format(name, self.board_url(self.registry[name])))
+
+    @commands.command()
+    @commands.is_owner()
+    async def removeboard(self, ctx: commands.Context, name: str):
+        """
+        Stop checking a plug.game board `%removeboard <name>`
+        """
+        name = name.lower()
+        async with self.config.registry() as registry:
+            board = registry.pop(name, None)
+            self.set_registry(dict(registry))
+        if board is None:
+            await ctx.send("There is no board called {}".format(name))
+            return
+        async with self.config.boards() as boards:
+            boards.pop(self.board_url(board), None)
+        await ctx.send("Board {} removed".format(name))
+
+    @commands.command()
+    @commands.is_owner()
+    async def setpolling(self, ctx: commands.Context, interval: int, active_interval: int = None):
+        """
+        Set how often the boards are checked in seconds `%setpolling <interval> <active_interval>`
+        The active interval is used in hours of the week that usually get posts
+        """
+        if active_interval is None:
+            active_interval = min(interval, self.active_interval)
+        if active_interval < 10 or interval < active_interval:
+            await ctx.send("Intervals must be at least 10 seconds, and the active one the shortest.")
+            return
+        await self.config.interval.set(interval)
+        await self.config.active_interval.set(active_interval)
+        self.interval = interval
+        self.active_interval = active_interval
+        await ctx.send("Boards will be checked every {}s, every {}s in active hours".format(
+            interval, active_interval))
+
+    @commands.command()
+    @commands.is_owner()
+    async def setcatchup(self, ctx: commands.Context, pages: int):
+        """
+        Set how many pages of a board are read when posts were missed `%setcatchup <pages>`
+        1 only ever reads the first page
+        """
+        if pages < 1:
+            await ctx.send("At least the first page has to be read.")
+            return
+        await self.config.catchup_pages.set(pages)
+        self.catchup_pages = pages
+        await ctx.send("Up to {} pages of a board will be read per check".format(pages))
+
+    @commands.command()
+    @commands.is_owner()
+    async def setcoalesce(self, ctx: commands.Context, seconds: int):
+        """
+        Hold new posts so ones found soon after share a message `%setcoalesce <seconds>`
+        0 sends every check's posts at once
+        """
+        if seconds < 0:
+            await ctx.send("The window cannot be negative.")
+            return
+        await self.config.coalesce.set(seconds)
+        self.coalesce = seconds
+        await ctx.send("New posts will be held for {}s before sending".format(seconds))
+
+    @commands.command()
+    @commands.is_owner()
+    async def setledger(self, ctx: commands.Context, *, path: str = None):
+        """
+        Share announcements with other bot processes through a SQLite file `%setledger <path>`
+        `%setledger default` keeps it in the data folder, leave it blank to stop sharing
+        """
+        if path == "default":
+            path = str(cog_data_path(self) / "krplug.sqlite3")
+        try:
+            await self.open_ledger(path)
+        except sqlite3.Error as e:
+            await ctx.send("Cannot open the ledger: {}".format(e))
+            return
+        await self.config.ledger.set(path)
+        if path is None:
+            await ctx.send("Announcements are no longer shared")
+        else:
+            await ctx.send("Announcements are shared through `{}`".format(path))
+
+    @commands.command()
+    @commands.is_owner()
+    async def plugstats(self, ctx: commands.Context, action: str = None):
+        """
+        Shows timings and counters of the announcement pipeline `%plugstats`
+        `%plugstats export` also writes them to a Prometheus text file
+        """
+        for page in pagify(self.metrics.summary(), shorten_by=10):
+            await ctx.send(box(page))
+        if action == "export":
+            path = str(cog_data_path(self) / "krplug.prom")
+            self.metrics.export(path)
+            await ctx.send("Metrics written to `{}`".format(path))
+
     @commands.command()
     @commands.guild_only()
     async def lastannounce(self, ctx: commands.Context):
         """
         Sends the last announcement `%lastannounce`
         """
-        await self.check_plug()
-        post_ids = await self.config.posts()
-        post_id = str(post_ids[0])
-        if post_id in self.full_posts:
-            await ctx.send(embed=self.get_embed(self.full_posts[post_id]))
+        # followers get their posts from the ledger and never scrape themselves
+        if not self.following and time.monotonic() - self.refreshed > self.CACHE_TTL:
+            await self.refresh_posts()
+        if self.cache:
+            await ctx.send(embed=self.cache[max(self.cache)][2])
         else:
             await ctx.send("Error, cannot find post for some reason.")
 
@@ -72,81 +342,510 @@ class KRPlug(Cog):
         """
         Force announce the last announcement `%forceannounce`
         """
-        post_ids = await self.config.posts()
-        post_id = str(post_ids[0])
-        if post_id in self.full_posts:
-            await self.send_announcements([self.full_posts[post_id]])
+        if self.cache:
+            await self.load_subscriptions()
+            await self.send_announcements([self.cache[max(self.cache)][1]], claim=False)
         else:
             await ctx.send("Error, cannot find post for some reason.")
 
     async def announce_cycle(self):
+        self.set_registry(await self.config.registry())
+        await self.migrate_posts()
+        self.interval = await self.config.interval()
+        self.active_interval = await self.config.active_interval()
+        self.catchup_pages = await self.config.catchup_pages()
+        self.coalesce = await self.config.coalesce()
+        self.activity = await self.config.activity()
+        self.prune_activity(self.activity)
+        await self.open_ledger(await self.config.ledger())
+        # %boards reads the routes, which are otherwise only built on delivery
+        await self.load_subscriptions()
         while True:
             if self is not self.bot.get_cog("KRPlug"):
                 print("Announce canceled, cog has been lost")
                 return
-            new_posts, new_ids = await self.check_plug()
-            if new_posts:
-                print("New posts found, attempting to send...")
-                await self.send_announcements(new_posts)
-                await self.save_plug(new_ids)
-            await asyncio.sleep(60)
-
-    async def send_announcements(self, results):
-        embeds = []
-        for result in results:
-            embeds.append(self.get_embed(result))
-        for guild in self.bot.guilds:
-            for embed in embeds:
-                channel = await self.config.guild(guild).channelid()
-                if channel is None:
-                    continue
-                channel = guild.get_channel(channel)
-                if channel is None:
+            due = []
+            try:
+                if self.ledger is not None:
+                    following = not await self.ledger_call(self.ledger.lead)
+                    if following and not self.following:
+                        await self.seed_cache()
+                    self.following = following
+                if self.following:
+                    await self.follow_ledger()
+                else:
+                    now = time.monotonic()
+                    due = [url for url, poll in self.polls.items() if poll["due"] <= now]
+                    if due:
+                        await self.poll_boards(due)
+            except Exception as e:
+                # a bad post or a busy ledger must not end the announcements
+                print("Announce cycle failed: {!r}".format(e))
+                for url in due:
+                    if url in self.polls:
+                        # the full pages are fetched again, so nothing found is lost
+                        self.validators.pop(url, None)
+                        self.schedule_poll(url, e)
+            if self.following:
+                await asyncio.sleep(self.FOLLOW_INTERVAL)
+                continue
+            # with every board removed there is nothing due, check back for new ones
+            next_due = min((poll["due"] for poll in self.polls.values()),
+                           default=time.monotonic() + self.interval)
+            await asyncio.sleep(max(1, next_due - time.monotonic()))
+
+    async def poll_boards(self, urls):
+        new_posts, new_ids, gaps = await self.check_plug(urls)
+        if new_posts:
+            print("New posts found, attempting to send...")
+            if self.ledger is not None:
+                await self.record_ledger(new_posts)
+            await self.announce(new_posts)
+            await self.record_activity(new_posts)
+        if new_ids or gaps:
+            await self.save_plug(new_ids, gaps)
+
+    async def open_ledger(self, path):
+        if self.ledger is not None:
+            self.ledger.close()
+            self.ledger = None
+            self.following = False
+        if path is None:
+            return
+        self.ledger = await self.ledger_call(Ledger, path)
+        # only posts found from now on are read, older ones were dealt with
+        self.ledger_seq = await self.ledger_call(self.ledger.last_seq)
+
+    def ledger_call(self, func, *args):
+        return self.bot.loop.run_in_executor(None, func, *args)
+
+    async def record_ledger(self, posts):
+        await self.ledger_call(self.ledger.add_posts, posts)
+        await self.ledger_call(self.ledger.prune, self.LEDGER_AGE)
+        self.ledger_seq = await self.ledger_call(self.ledger.last_seq)
+
+    # followers only read posts found after they opened the ledger, so
+    # %lastannounce starts from the newest ones recorded before that
+    async def seed_cache(self):
+        posts = await self.ledger_call(self.ledger.latest, self.CACHE_SIZE)
+        self.cache_posts({post['id']: post for post in posts})
+        self.refreshed = time.monotonic()
+        await self.save_followed(posts)
+
+    async def follow_ledger(self):
+        posts, self.ledger_seq = await self.ledger_call(self.ledger.posts_since, self.ledger_seq)
+        self.refreshed = time.monotonic()
+        if posts:
+            self.cache_posts({post['id']: post for post in posts})
+            await self.announce(posts)
+            await self.save_followed(posts)
+
+    # followers keep their own boards up to date from the ledger, so one that
+    # takes over neither misses nor repeats posts
+    async def save_followed(self, posts):
+        new_ids = {}
+        for post in posts:
+            new_ids.setdefault(post['board'], []).append(post['id'])
+        async with self.config.boards() as boards:
+            for url, ids in new_ids.items():
+                # the ledger only holds new posts, anything older was seen by the leader
+                boards.setdefault(url, {"high": 0, "recent": [], "floor": min(ids)})
+        await self.save_plug(new_ids)
+
+    async def announce(self, posts):
+        if not self.coalesce:
+            await self.deliver(posts)
+            return
+        # hold the posts briefly so ones found by the next checks share the messages
+        self.pending += posts
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = self.bot.loop.create_task(self.flush_pending())
+
+    async def flush_pending(self):
+        await asyncio.sleep(self.coalesce)
+        posts, self.pending = self.pending, []
+        await self.deliver(posts)
+
+    async def deliver(self, posts):
+        await self.load_subscriptions()
+        await self.send_announcements(posts)
+        # from the time shown on plug.game, so only accurate to the minute
+        delivered = datetime.now(tz=pytz.utc)
+        for post in posts:
+            self.metrics.observe("delivery", (delivered - post['timestamp']).total_seconds())
+
+    def poll_interval(self):
+        now = datetime.utcnow()
+        hour = now.weekday() * 24 + now.hour
+        # the hour either side counts too, posts rarely land on the hour
+        posts = sum(hours.get(str((hour + i) % 168), 0)
+                    for hours in self.activity.values() for i in (-1, 0, 1))
+        if posts >= self.ACTIVE_THRESHOLD:
+            return self.active_interval
+        return self.interval
+
+    def schedule_poll(self, url, result):
+        poll = self.polls[url]
+        if not isinstance(result, Exception):
+            if poll["failures"] >= self.BREAKER_THRESHOLD:
+                print("{} is reachable again".format(url))
+            poll["failures"] = 0
+            poll["due"] = time.monotonic() + self.poll_interval()
+            return
+        poll["failures"] += 1
+        # the breaker opens after repeated failures, the board is then only
+        # probed once per cooldown until a poll succeeds
+        if poll["failures"] >= self.BREAKER_THRESHOLD:
+            if poll["failures"] == self.BREAKER_THRESHOLD:
+                print("{} keeps failing, pausing it: {!r}".format(url, result))
+            delay = self.BREAKER_COOLDOWN
+        else:
+            backoff = min(self.interval * 2 ** poll["failures"], self.MAX_BACKOFF)
+            delay = random.uniform(self.interval, backoff)
+        poll["due"] = time.monotonic() + delay
+
+    async def record_activity(self, posts):
+        async with self.config.activity() as activity:
+            for post in posts:
+                timestamp = post['timestamp']
+                hours = activity.setdefault(str(self.week(timestamp)), {})
+                hour = str(timestamp.weekday() * 24 + timestamp.hour)
+                hours[hour] = hours.get(hour, 0) + 1
+            self.prune_activity(activity)
+            self.activity = dict(activity)
+
+    def week(self, timestamp):
+        return timestamp.toordinal() // 7
+
+    # only recent weeks count, so an hour stops being active once posts stop
+    # landing in it
+    def prune_activity(self, activity):
+        week = self.week(datetime.utcnow())
+        for key, hours in list(activity.items()):
+            # counts kept per hour only, from before weeks were tracked, go too
+            if not isinstance(hours, dict) or week - int(key) >= self.ACTIVITY_WEEKS:
+                del activity[key]
+
+    async def send_announcements(self, results, claim=True):
+        with self.metrics.timer("send"):
+            # every channel gets the posts of its boards, in one ordered batch
+            batches = {}
+            for result in results:
+                for target in self.routes.get(self.urls.get(result['board']), ()):
+                    # guilds on another shard, or ones the bot has left, are not ours
+                    if self.bot.get_guild(target[0]) is None:
+                        continue
+                    batches.setdefault(target, []).append(result)
+            # with a ledger, only the process that claims a post for a channel sends it
+            if claim and self.ledger is not None and batches:
+                claimed = await self.ledger_call(self.ledger.claim, [
+                    (result['id'], channel_id)
+                    for (guild_id, channel_id), posts in batches.items() for result in posts])
+                batches = {target: [result for result in posts if (result['id'], target[1]) in claimed]
+                           for target, posts in batches.items()}
+            sends = [self.send_channel(channel_id, [self.cached_embed(result) for result in posts])
+                     for (guild_id, channel_id), posts in batches.items() if posts]
+            await asyncio.gather(*sends)
+        await self.prune_channels()
+
+    async def send_channel(self, channel_id, embeds):
+        channel = self.bot.get_channel(channel_id)
+        if channel is None:
+            self.failures[channel_id] += 1
+            return
+        # a channel is a single rate limit bucket, so its messages go out in order
+        # while the semaphore bounds how many buckets are hit at once
+        for batch in self.batch_embeds(embeds):
+            self.metrics.incr("send_attempted")
+            try:
+                async with self.send_slots:
+                    if MULTI_EMBED:
+                        await channel.send(embeds=batch)
+                    else:
+                        await channel.send(embed=batch[0])
+            except (discord.errors.Forbidden, discord.errors.NotFound) as e:
+                self.metrics.incr("send_failed")
+                self.failures[channel_id] += 1
+                print("Cannot send to {}: {}".format(channel_id, e))
+                return
+            except discord.errors.HTTPException as e:
+                self.metrics.incr("send_failed")
+                if e.status == 429:
+                    self.metrics.incr("rate_limited")
+                print(e)
+            except Exception as e:
+                self.metrics.incr("send_failed")
+                print(e)
+            else:
+                self.metrics.incr("sent")
+                self.failures.pop(channel_id, None)
+
+    # as few messages as Discord allows, up to 10 embeds and 6000 characters each
+    def batch_embeds(self, embeds):
+        if not MULTI_EMBED:
+            return [[embed] for embed in embeds]
+        batches = []
+        size = 0
+        for embed in embeds:
+            if not batches or len(batches[-1]) == self.EMBEDS_PER_MESSAGE \
+                    or size + len(embed) > self.EMBED_CHARACTERS:
+                batches.append([])
+                size = 0
+            batches[-1].append(embed)
+            size += len(embed)
+        return batches
+
+    def set_registry(self, registry):
+        self.registry = registry
+        self.urls = {self.board_url(board): name for name, board in registry.items()}
+        for url in self.urls:
+            self.polls.setdefault(url, {"due": 0, "failures": 0})
+        for url in list(self.polls):
+            if url not in self.urls:
+                del self.polls[url]
+        self.build_routes()
+
+    def board_url(self, board):
+        return "https://www.plug.game/{game}/posts?menuId={menuId}".format(**board)
+
+    async def load_subscriptions(self):
+        guilds = await self.config.all_guilds()
+        self.subscriptions = {guild_id: self.guild_subscriptions(data)
+                              for guild_id, data in guilds.items()}
+        self.build_routes()
+
+    async def load_guild(self, guild):
+        self.subscriptions[guild.id] = self.guild_subscriptions(await self.config.guild(guild).all())
+        self.build_routes()
+
+    def guild_subscriptions(self, data):
+        channels = {int(channel_id): set(boards)
+                    for channel_id, boards in data.get("subscriptions", {}).items()}
+        if data.get("channelid") is not None:
+            channels[data["channelid"]] = None
+        return channels
+
+    def guild_boards(self, guild_id, channel_id):
+        boards = self.subscriptions.get(guild_id, {}).get(channel_id, set())
+        return sorted(self.registry if boards is None else boards.intersection(self.registry))
+
+    # index the subscriptions by board so routing a post only visits its subscribers
+    def build_routes(self):
+        routes = {name: [] for name in self.registry}
+        for guild_id, channels in self.subscriptions.items():
+            for channel_id, boards in channels.items():
+                for name in self.registry if boards is None else boards:
+                    if name in routes:
+                        routes[name].append((guild_id, channel_id))
+        self.routes = routes
+
+    async def prune_channels(self):
+        # drop channels that keep failing, usually deleted or without permissions
+        for channel_id, count in list(self.failures.items()):
+            if count < self.MAX_FAILURES:
+                continue
+            del self.failures[channel_id]
+            for guild_id, channels in list(self.subscriptions.items()):
+                if channel_id not in channels:
                     continue
-                # avoid permissions problems
-                try:
-                    await channel.send(embed=embed)
-                except discord.errors.Forbidden as e:
-                    print("FORBIDDEN: " + str(e))
-                except Exception as e:
-                    print(e)
-
-    async def check_plug(self):
-        pages = await self.scrape_plug()
-        # process the pages into a nicer format
-        post_ids, self.full_posts = self.process_pages(pages)
-        # check for new posts
-        old_ids = await self.config.posts()
+                guild = self.bot.get_guild(guild_id)
+                if guild is not None:
+                    if await self.config.guild(guild).channelid() == channel_id:
+                        await self.config.guild(guild).channelid.set(None)
+                    async with self.config.guild(guild).subscriptions() as subscriptions:
+                        subscriptions.pop(str(channel_id), None)
+                del channels[channel_id]
+                print("Pruned announcement channel {} of guild {}".format(channel_id, guild_id))
+        self.build_routes()
+
+    async def check_plug(self, urls=None, poll=True):
+        async with self.refresh_lock:
+            with self.metrics.timer("check"):
+                return await self.refresh_plug(urls or list(self.urls), poll)
+
+    # only one scrape is in flight, callers arriving meanwhile share its result
+    async def refresh_posts(self):
+        if self.refresh_lock.locked():
+            async with self.refresh_lock:
+                return
+        # only fills the cache, new posts are left for the announce cycle to find
+        await self.check_plug(poll=False)
+
+    # without poll the validators and poll times are left alone, so the next
+    # poll still gets the full pages and sees the posts found here as new
+    async def refresh_plug(self, urls, poll=True):
+        pages = await self.scrape_plug(urls, poll)
+        if poll:
+            for url, page in zip(urls, pages):
+                self.schedule_poll(url, page)
+        if not all(isinstance(page, Exception) for page in pages):
+            self.refreshed = time.monotonic()
+        # unchanged (304) and failed boards have nothing new to process, apart
+        # from a gap left by an earlier cycle
+        pages = {url: page for url, page in zip(urls, pages) if isinstance(page, str)}
+        boards = await self.config.boards()
+        resume = [url for url in urls if url not in pages and boards.get(url, {}).get("gaps")]
+        if not pages and not resume:
+            return [], {}, {}
+        seen = {url: boards.get(url, {"high": 0, "recent": []}) for url in list(pages) + resume}
+        # posts that are both cached and saved need not be parsed again, expired
+        # ones are parsed again to pick up edits
+        now = time.monotonic()
+        known = frozenset(post_id for board in seen.values() for post_id in board["recent"])
+        known = known.intersection(
+            post_id for post_id, entry in self.cache.items() if entry[0] > now)
+        # process the pages into a nicer format, off the event loop so a large
+        # page does not hold up the gateway heartbeat
+        post_ids, posts = await self.parse_pages(pages, known)
+        # more new posts than fit on a page, keep walking the pages of those boards
+        # until one reaches a seen post, a walk cut short by catchup_pages is
+        # saved as a gap [floor, top, page] and carried on from that page next
+        # cycle, every id between floor and top is new
+        gaps = {}
+        for url, board in seen.items():
+            ids = post_ids.get(url, [])
+            pending = [list(gap) for gap in board.get("gaps", [])]
+            if self.is_behind(board, ids):
+                pending.insert(0, [board["high"], ids[-1], 1])
+            if pending:
+                gaps[url] = pending
+        found = {url: [] for url in gaps}
+        walking = list(gaps)
+        page_count = 1
+        while walking and page_count < self.catchup_pages:
+            page_count += 1
+            # catch-up pages shift with every new post, their validators are useless
+            more = await self.scrape_plug([self.page_url(url, gaps[url][0][2] + 1) for url in walking], False)
+            more = {url: page for url, page in zip(walking, more) if isinstance(page, str)}
+            more_ids, more_posts = await self.parse_pages(more, known)
+            posts.update(more_posts)
+            for url, ids in more_ids.items():
+                gap = gaps[url][0]
+                found[url] += [post_id for post_id in ids if gap[0] < post_id < gap[1]]
+                gap[1] = min([gap[1]] + ids)
+                gap[2] += 1
+                if not ids or ids[-1] <= gap[0]:
+                    gaps[url].pop(0)
+            walking = [url for url in more if gaps[url]]
+        behind = [url for url, pending in gaps.items() if pending]
+        if behind:
+            print("Stopped catching up after {} pages, carrying on next cycle: {}".format(
+                page_count, ", ".join(behind)))
+        self.cache_posts(posts)
+        # check for new posts, a board seen for the first time is only recorded
         new_posts = []
-        if old_ids:
-            diff = list(set(post_ids) - set(old_ids))
-            for post_id in diff:
-                new_posts.append(self.full_posts[str(post_id)])
-        return new_posts, post_ids
-
-    # save post history
-    async def save_plug(self, new_ids):
-        async with self.config.posts() as posts:
-            for new_id in new_ids:
-                if new_id not in posts:
-                    posts.append(new_id)
-            posts.sort(reverse=True)
-
-    async def scrape_plug(self):
+        new_ids = {}
+        for url, board in seen.items():
+            unseen = self.unseen_ids(board, post_ids.get(url, [])) + found.get(url, [])
+            if not unseen:
+                continue
+            new_ids[url] = unseen
+            if board["recent"]:
+                new_posts += [posts[post_id] for post_id in unseen if post_id in posts]
+        return new_posts, new_ids, gaps
+
+    async def parse_pages(self, pages, known):
+        with self.metrics.timer("parse"):
+            post_ids, posts = await self.bot.loop.run_in_executor(
+                None, self.process_pages, pages, known)
+        self.metrics.incr("posts_parsed", len(posts))
+        return post_ids, posts
+
+    # a board with history whose last post on the page is newer than anything
+    # seen, a board seen for the first time is only recorded from its first page
+    def is_behind(self, board, ids):
+        return bool(board["recent"] and ids and ids[-1] > board["high"])
+
+    def page_url(self, url, page_number):
+        return "{}&page={}".format(url, page_number)
+
+    def unseen_ids(self, board, ids):
+        recent = set(board["recent"])
+        # anything older than a full window is history that is no longer tracked
+        floor = min(recent) if len(recent) >= self.SEEN_WINDOW else board.get("floor", 0)
+        return [post_id for post_id in ids
+                if post_id > board["high"] or (post_id > floor and post_id not in recent)]
+
+    # save post history, a high-water mark and a bounded window per board, with
+    # the gaps still to walk
+    async def save_plug(self, new_ids, gaps=None):
+        async with self.config.boards() as boards:
+            for url, ids in new_ids.items():
+                board = boards.get(url, {"high": 0, "recent": []})
+                recent = sorted(set(board["recent"]).union(ids), reverse=True)
+                boards[url] = dict(board, high=max(board["high"], recent[0]),
+                                   recent=recent[:self.SEEN_WINDOW])
+            for url, pending in (gaps or {}).items():
+                board = boards.setdefault(url, {"high": 0, "recent": []})
+                if pending:
+                    board["gaps"] = pending
+                else:
+                    board.pop("gaps", None)
+
+    # seed the board windows from the old global post list, article ids are
+    # shared by every board so its newest ids are a valid window for each one
+    async def migrate_posts(self):
+        posts = await self.config.posts()
+        if not posts:
+            return
+        recent = sorted(set(posts), reverse=True)[:self.SEEN_WINDOW]
+        async with self.config.boards() as boards:
+            for url in self.urls:
+                boards.setdefault(url, {"high": recent[0], "recent": recent})
+        await self.config.posts.clear()
+
+    def cache_posts(self, posts):
+        expires = time.monotonic() + self.CACHE_TTL
+        for post_id, post in posts.items():
+            self.cache[post_id] = (expires, post, self.get_embed(post))
+        # keep only the newest posts
+        for post_id in sorted(self.cache)[:-self.CACHE_SIZE]:
+            del self.cache[post_id]
+
+    def cached_embed(self, post):
+        entry = self.cache.get(post['id'])
+        if entry is not None and entry[1] is post:
+            return entry[2]
+        return self.get_embed(post)
+
+    async def scrape_plug(self, urls, conditional=True):
         # scrape the Plug pages
-        client = aiohttp.ClientSession(loop=self.bot.loop)
-        async with client as session:
+        with self.metrics.timer("scrape"):
             pages = await asyncio.gather(
-                *[self.fetch(session, url) for url in self.URLS],
-                loop=self.bot.loop,
+                *[self.fetch(self.session, url, conditional) for url in urls],
                 return_exceptions=True
             )
+        for url, page in zip(urls, pages):
+            if isinstance(page, Exception):
+                self.metrics.incr("fetch_failed", label=self.board_label(url))
+            elif page is None:
+                self.metrics.incr("not_modified", label=self.board_label(url))
         return pages
 
-    async def fetch(self, session, url):
-        async with async_timeout.timeout(10):
-            async with session.get(url) as response:
-                return await response.text()
+    async def fetch(self, session, url, conditional=True):
+        # conditional request, returns None if the page has not changed
+        headers = {}
+        etag, last_modified = self.validators.get(url, (None, None)) if conditional else (None, None)
+        if etag is not None:
+            headers["If-None-Match"] = etag
+        if last_modified is not None:
+            headers["If-Modified-Since"] = last_modified
+        with self.metrics.timer("fetch", self.board_label(url)):
+            async with async_timeout.timeout(10):
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        return None
+                    response.raise_for_status()
+                    body = await response.read()
+                    self.metrics.incr("bytes", len(body), self.board_label(url))
+                    text = await response.text()
+                    if conditional:
+                        self.validators[url] = (response.headers.get("ETag"),
+                                                response.headers.get("Last-Modified"))
+                    return text
+
+    def board_label(self, url):
+        return self.urls.get(url.split("&page=", 1)[0], url)
 
     def get_embed(self, dic):
         if dic:
@@ -163,39 +862,57 @@ class KRPlug(Cog):
         else:
             return discord.Embed(title='No Articles')
 
-    def process_pages(self, pages):
-        ids = []
+    def process_pages(self, pages, known=frozenset()):
+        ids = {}
         attributes = {}
-        for i, page in enumerate(pages):
-            soup = BeautifulSoup(page, 'html.parser')
-            contents = soup.find_all(class_='frame_plug')
-            # get a list of article-ids
-            ids += [int(content.attrs['data-articleid'])
-                    for content in contents]
-            # get a dictionary of attributes of every forum post in the page
-            for content in contents:
-                post = {
-                    'title': re.sub('\s+', ' ', html.unescape(content.find(class_='tit_feed').string)).strip(),
-                    'description': re.sub('\s+', ' ', html.unescape(content.find(class_='txt_feed').string)).strip(),
-                    'url': 'https://www.plug.game/kingsraid/1030449/posts/' + content.attrs['data-articleid'],
-                    'timestamp': self.get_time(content.find_all(class_='time')[1].string),
-                    'author': {
-                        'name': re.sub('\s+', ' ', content.find(class_='name').string).strip(),
-                        'url': 'https://plug.game' + content.find(class_='name').attrs['href'],
-                        'icon_url': content.find(class_='thumb').attrs['src']
-                    }
-                }
-                if content.find_all(class_='img'):
-                    post['thumbnail'] = {'url': content.find(
-                        class_='img').attrs['style'][21:-1]}
-                attributes[content.attrs['data-articleid']] = post
-        ids.sort()
+        for url, page in pages.items():
+            ids[url] = []
+            soup = BeautifulSoup(page, PARSER, parse_only=FEED_STRAINER)
+            for content in soup.find_all(class_='frame_plug', recursive=False):
+                article_id = int(content.attrs['data-articleid'])
+                # every id is listed, pinned posts can put known ones above new
+                # ones, but known posts are not parsed again
+                ids[url].append(article_id)
+                if article_id in known:
+                    continue
+                post = self.process_post(content, url.split('?', 1)[0])
+                post['board'] = url
+                attributes[article_id] = post
         return ids, attributes
 
+    def process_post(self, content, posts_url):
+        # collect every classed node of the post in a single walk
+        nodes = {}
+        times = []
+        for tag in content.find_all(class_=True):
+            for class_ in tag.attrs['class']:
+                if class_ == 'time':
+                    times.append(tag)
+                elif class_ in POST_FIELDS and class_ not in nodes:
+                    nodes[class_] = tag
+        post = {
+            'id': int(content.attrs['data-articleid']),
+            # get_text, as .string is None once there is markup inside
+            'title': self.clean(html.unescape(nodes['tit_feed'].get_text())),
+            'description': self.clean(html.unescape(nodes['txt_feed'].get_text())),
+            'url': posts_url + '/' + content.attrs['data-articleid'],
+            'timestamp': self.get_time(times[1].string),
+            'author': {
+                'name': self.clean(nodes['name'].string),
+                'url': 'https://plug.game' + nodes['name'].attrs['href'],
+                'icon_url': nodes['thumb'].attrs['src']
+            }
+        }
+        if 'img' in nodes:
+            post['thumbnail'] = {'url': nodes['img'].attrs['style'][21:-1]}
+        return post
+
+    def clean(self, string_):
+        return WHITESPACE.sub(' ', string_).strip()
+
     def get_time(self, time_str):
         # parsedatetime NLP does not understand min/hr
         time_str = time_str.replace('min', 'minute').replace('hr', 'hour')
-        cal = parsedatetime.Calendar()
         # I honestly don't care if it can't parse the time correctly, it will just output current time
-        dt = datetime(*cal.parse(time_str)[0][:6])
+        dt = datetime(*self.calendar.parse(time_str)[0][:6])
         return dt.replace(tzinfo=get_localzone()).astimezone(tz=pytz.utc)
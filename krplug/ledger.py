@@ -0,0 +1,139 @@
+from datetime import datetime
+import json
+import sqlite3
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+class Ledger:
+    """
+    Announcements shared by every bot process on the machine.
+
+    The process holding the lock file polls plug.game and records the posts it
+    found, the others read them from here. A post is only sent to a channel by
+    the process that claims the (post, channel) pair first. Calls block, so
+    they are run in an executor.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, timeout=10, check_same_thread=False,
+                                  isolation_level=None)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS posts (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id INTEGER NOT NULL UNIQUE,
+                post TEXT NOT NULL,
+                found REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS claims (
+                post_id INTEGER NOT NULL,
+                channel_id INTEGER NOT NULL,
+                claimed REAL NOT NULL,
+                PRIMARY KEY (post_id, channel_id)
+            );
+        """)
+        self.lock_file = None
+
+    def lead(self):
+        """
+        Whether this process is the one polling, taking over if no one is.
+        """
+        if self.lock_file is not None:
+            return True
+        if fcntl is None:
+            # no file locks here, so there is only ever this process
+            self.lock_file = True
+            return True
+        lock_file = open(self.path + ".lock", "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self.lock_file = lock_file
+        return True
+
+    def last_seq(self):
+        with self.lock:
+            return self.db.execute("SELECT COALESCE(MAX(seq), 0) FROM posts").fetchone()[0]
+
+    def add_posts(self, posts):
+        rows = [(post['id'], json.dumps(post, default=self.encode), time.time()) for post in posts]
+        with self.lock:
+            self.db.executemany("INSERT OR IGNORE INTO posts (id, post, found) VALUES (?, ?, ?)", rows)
+
+    def posts_since(self, seq):
+        """
+        Posts recorded after `seq`, and the seq to read from next time.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT seq, post FROM posts WHERE seq > ? ORDER BY seq",
+                                   (seq,)).fetchall()
+        posts = [self.decode(post) for seq, post in rows]
+        if rows:
+            seq = rows[-1][0]
+        return posts, seq
+
+    def latest(self, count):
+        """
+        The `count` posts recorded last, newest first.
+        """
+        with self.lock:
+            rows = self.db.execute("SELECT post FROM posts ORDER BY seq DESC LIMIT ?",
+                                   (count,)).fetchall()
+        return [self.decode(post) for post, in rows]
+
+    def claim(self, pairs):
+        """
+        Claims (post id, channel id) pairs, returns the ones this process won.
+        """
+        claimed = set()
+        now = time.time()
+        with self.lock:
+            self.db.execute("BEGIN IMMEDIATE")
+            try:
+                for post_id, channel_id in pairs:
+                    cursor = self.db.execute(
+                        "INSERT OR IGNORE INTO claims (post_id, channel_id, claimed) VALUES (?, ?, ?)",
+                        (post_id, channel_id, now))
+                    if cursor.rowcount:
+                        claimed.add((post_id, channel_id))
+                self.db.execute("COMMIT")
+            except Exception:
+                self.db.execute("ROLLBACK")
+                raise
+        return claimed
+
+    def prune(self, max_age):
+        cutoff = time.time() - max_age
+        with self.lock:
+            self.db.execute("DELETE FROM claims WHERE claimed < ?", (cutoff,))
+            self.db.execute("DELETE FROM posts WHERE found < ?", (cutoff,))
+
+    def close(self):
+        with self.lock:
+            self.db.close()
+        if self.lock_file not in (None, True):
+            self.lock_file.close()
+        self.lock_file = None
+
+    @staticmethod
+    def decode(post):
+        post = json.loads(post)
+        post['timestamp'] = datetime.fromisoformat(post['timestamp'])
+        return post
+
+    @staticmethod
+    def encode(value):
+        if isinstance(value, datetime):
+            return value.isoformat()
+        raise TypeError(repr(value))
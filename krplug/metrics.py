@@ -0,0 +1,92 @@
+from collections import Counter
+from contextlib import contextmanager
+import os
+import time
+
+
+class Metrics:
+    """
+    Counters and stage timings of the announcement pipeline, kept as plain
+    numbers and only formatted when someone asks for them.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        # (name, label) -> value
+        self.counters = Counter()
+        # (stage, label) -> [count, total seconds, max seconds, last seconds]
+        self.timings = {}
+
+    def incr(self, name, value=1, label=""):
+        self.counters[name, label] += value
+
+    def observe(self, stage, seconds, label=""):
+        timing = self.timings.get((stage, label))
+        if timing is None:
+            self.timings[stage, label] = [1, seconds, seconds, seconds]
+        else:
+            timing[0] += 1
+            timing[1] += seconds
+            timing[3] = seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+
+    @contextmanager
+    def timer(self, stage, label=""):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - start, label)
+
+    def summary(self):
+        lines = ["{:<28}{:>7}{:>10}{:>10}{:>10}".format("stage", "count", "avg", "max", "last")]
+        for (stage, label), (count, total, max_, last) in sorted(self.timings.items()):
+            lines.append("{:<28}{:>7}{:>10}{:>10}{:>10}".format(
+                self.name(stage, label), count, self.seconds(total / count),
+                self.seconds(max_), self.seconds(last)))
+        lines.append("")
+        lines.append("{:<28}{:>17}".format("counter", "value"))
+        for (name, label), value in sorted(self.counters.items()):
+            lines.append("{:<28}{:>17}".format(self.name(name, label), value))
+        return "\n".join(lines)
+
+    def prometheus(self):
+        lines = ["# HELP krplug_stage_seconds Time spent in each stage of the announcement pipeline.",
+                 "# TYPE krplug_stage_seconds summary"]
+        for (stage, label), (count, total, max_, last) in sorted(self.timings.items()):
+            labels = self.labels(stage=stage, board=label)
+            lines.append("krplug_stage_seconds_sum{} {}".format(labels, total))
+            lines.append("krplug_stage_seconds_count{} {}".format(labels, count))
+        lines.append("# HELP krplug_events_total Events counted by the announcement pipeline.")
+        lines.append("# TYPE krplug_events_total counter")
+        for (name, label), value in sorted(self.counters.items()):
+            lines.append("krplug_events_total{} {}".format(
+                self.labels(event=name, board=label), value))
+        lines.append("# HELP krplug_start_time_seconds When the counters were started.")
+        lines.append("# TYPE krplug_start_time_seconds gauge")
+        lines.append("krplug_start_time_seconds {}".format(self.started))
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        # write next to the target and rename, so a scraper never reads half a file
+        temp = path + ".tmp"
+        with open(temp, "w") as f:
+            f.write(self.prometheus())
+        os.replace(temp, path)
+
+    @staticmethod
+    def name(name, label):
+        return name + " " + label if label else name
+
+    @staticmethod
+    def labels(**labels):
+        pairs = ['{}="{}"'.format(k, v.replace("\\", "\\\\").replace('"', '\\"'))
+                 for k, v in labels.items() if v]
+        return "{" + ",".join(pairs) + "}"
+
+    @staticmethod
+    def seconds(value):
+        if value < 1:
+            return "{:.1f}ms".format(value * 1000)
+        return "{:.2f}s".format(value)